@@ -1,60 +1,61 @@
 import os
-from langchain_openai import ChatOpenAI
+import sys
+from functools import partial
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.exceptions import OutputParserException
 from dotenv import load_dotenv
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from pipeline import EmailPipeline, PipelineConfig
+from model_policy import validate_email
+
 load_dotenv()
 
+PORTFOLIO_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resource", "my_portfolio.csv")
+
+MAIL_PROMPT = PromptTemplate.from_template(
+    """
+    ### JOB DESCRIPTION:
+    {job_description}
+
+    ### INSTRUCTION:
+    You are Mohan, a business development executive at AtliQ. AtliQ is an AI & Software Consulting company dedicated to facilitating
+    the seamless integration of business processes through automated tools. 
+    Over our experience, we have empowered numerous enterprises with tailored solutions, fostering scalability, 
+    process optimization, cost reduction, and heightened overall efficiency. 
+    Your job is to write a cold email to the client regarding the job mentioned above describing the capability of AtliQ 
+    in fulfilling their needs.
+    Also add the most relevant ones from the following links to showcase Atliq's portfolio: {link_list}
+    Remember you are Mohan, BDE at AtliQ. 
+    Do not provide a preamble.
+    ### EMAIL (NO PREAMBLE):
+
+    """
+)
+
+
+def mail_variables(job, links):
+    return {"job_description": str(job), "link_list": "\n".join(f"- {link['links']}" for link in links)}
+
+
+# MAIL_PROMPT does not ask for a subject line, so don't escalate emails for lacking one
+validate_mail = partial(validate_email, require_subject=False)
+
+
 class Chain:
-    def __init__(self):
-        self.llm = ChatOpenAI(temperature=0, openai_api_key=os.getenv("OPENAI_API_KEY"), model_name="gpt-4o-mini")
+    def __init__(self, pipeline=None):
+        self.pipeline = pipeline or EmailPipeline(PipelineConfig(portfolio_csv=PORTFOLIO_CSV),
+                                                  prompt=MAIL_PROMPT, variables=mail_variables,
+                                                  validate=validate_mail)
+        self.policy = self.pipeline.policy
 
     def extract_jobs(self, cleaned_text):
-        prompt_extract = PromptTemplate.from_template(
-            """
-            ### SCRAPED TEXT FROM WEBSITE:
-            {page_data}
-            ### INSTRUCTION:
-            The scraped text is from the career's page of a website.
-            Your job is to extract the job postings and return them in JSON format containing the following keys: `role`, `experience`, `skills` and `description`.
-            Only return the valid JSON.
-            ### VALID JSON (NO PREAMBLE):
-            """
-        )
-        chain_extract = prompt_extract | self.llm
-        res = chain_extract.invoke(input={"page_data": cleaned_text})
-        try:
-            json_parser = JsonOutputParser()
-            res = json_parser.parse(res.content)
-        except OutputParserException:
-            raise OutputParserException("Context too big. Unable to parse jobs.")
-        return res if isinstance(res, list) else [res]
+        return self.pipeline.extract_jobs(cleaned_text)
 
     def write_mail(self, job, links):
-        prompt_email = PromptTemplate.from_template(
-            """
-            ### JOB DESCRIPTION:
-            {job_description}
-
-            ### INSTRUCTION:
-            You are Mohan, a business development executive at AtliQ. AtliQ is an AI & Software Consulting company dedicated to facilitating
-            the seamless integration of business processes through automated tools. 
-            Over our experience, we have empowered numerous enterprises with tailored solutions, fostering scalability, 
-            process optimization, cost reduction, and heightened overall efficiency. 
-            Your job is to write a cold email to the client regarding the job mentioned above describing the capability of AtliQ 
-            in fulfilling their needs.
-            Also add the most relevant ones from the following links to showcase Atliq's portfolio: {link_list}
-            Remember you are Mohan, BDE at AtliQ. 
-            Do not provide a preamble.
-            ### EMAIL (NO PREAMBLE):
-
-            """
-        )
-        chain_email = prompt_email | self.llm
-        res = chain_email.invoke({"job_description": str(job), "link_list": links})
-        return res.content
+        return self.pipeline.write_email(job, links)
 
 if __name__ == "__main__":
     print(os.getenv("OPENAI_API_KEY"))
\ No newline at end of file
@@ -1,35 +1,63 @@
+import time
+
 import streamlit as st
-from langchain_community.document_loaders import WebBaseLoader
 
 from chains import Chain
+from ledger import company_from_url
 from portfolio import Portfolio
-from utils import clean_text
 
 
-def create_streamlit_app(llm, portfolio, clean_text):
+def create_streamlit_app(llm, portfolio):
     st.title("📧 Cold Mail Generator")
     url_input = st.text_input("Enter a URL:", value="https://jobs.nike.com/job/R-33460")
+    crawl = st.checkbox("Crawl paginated job listings", value=False)
+    max_pages = st.number_input("Max listing pages", min_value=1, max_value=500, value=20, disabled=not crawl)
     submit_button = st.button("Submit")
 
     if submit_button:
         try:
-            loader = WebBaseLoader([url_input])
-            data = clean_text(loader.load().pop().page_content)
+            pipeline = llm.pipeline
             portfolio.load_portfolio()
-            jobs = llm.extract_jobs(data)
-            for job in jobs:
-                skills = job.get('skills', [])
-                links = portfolio.query_links(skills)
-                email = llm.write_mail(job, links)
-                st.code(email, language='markdown')
+            company = company_from_url(url_input)
+            ledger = pipeline.ledger
+            if ledger and company and ledger.contacted_recently(company):
+                st.warning(f"An email to {company} was already generated recently; see history before sending.")
+
+            def show(result):
+                if result.get("ledger"):
+                    st.caption(f"Reusing email generated at {time.ctime(result['generated_at'])}")
+                st.code(result["email"], language='markdown')
+
+            if crawl:
+                # Pages are fetched and extracted lazily; emails render as soon as each one is ready
+                status = st.empty()
+                count = 0
+                for result in pipeline.stream(url_input, max_pages=int(max_pages)):
+                    count += 1
+                    status.caption(f"{count} jobs processed (page: {result['url']})")
+                    st.subheader(result["job"].get("role", "Job"))
+                    if result["error"]:
+                        st.error(f"Generation failed: {result['error']}")
+                    else:
+                        show(result)
+                status.caption(f"Done: {count} jobs processed")
+            else:
+                # Ledger reuse, semantic cache, request batching and single-flight all live in the pipeline
+                for job in pipeline.jobs_from_url(url_input):
+                    show(pipeline.generate_email(job, url=url_input, company=company))
         except Exception as e:
             st.error(f"An Error Occurred: {e}")
 
 
-if __name__ == "__main__":
-    chain = Chain()
-    portfolio = Portfolio()
-    st.set_page_config(layout="wide", page_title="Cold Email Generator", page_icon="📧")
-    create_streamlit_app(chain, portfolio, clean_text)
+@st.cache_resource
+def get_chain():
+    # One pipeline per server process, so its collection, batcher and stats survive reruns
+    return Chain()
 
 
+if __name__ == "__main__":
+    # set_page_config must be the first Streamlit command; the cache_resource spinner counts as one
+    st.set_page_config(layout="wide", page_title="Cold Email Generator", page_icon="📧")
+    chain = get_chain()
+    portfolio = Portfolio(pipeline=chain.pipeline)
+    create_streamlit_app(chain, portfolio)
@@ -1,21 +1,23 @@
-import pandas as pd
-import chromadb
-import uuid
+import os
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from pipeline import EmailPipeline, PipelineConfig
 
 
 class Portfolio:
-    def __init__(self, file_path="app/resource/my_portfolio.csv"):
+    """Portfolio links served from the shared pipeline's collection."""
+
+    def __init__(self, file_path="app/resource/my_portfolio.csv", pipeline=None):
         self.file_path = file_path
-        self.data = pd.read_csv(file_path)
-        self.chroma_client = chromadb.PersistentClient('vectorstore')
-        self.collection = self.chroma_client.get_or_create_collection(name="portfolio")
+        self.pipeline = pipeline or EmailPipeline(PipelineConfig(portfolio_csv=file_path))
 
     def load_portfolio(self):
-        if not self.collection.count():
-            for _, row in self.data.iterrows():
-                self.collection.add(documents=row["Techstack"],
-                                    metadatas={"links": row["Links"]},
-                                    ids=[str(uuid.uuid4())])
+        return self.pipeline.collection
 
     def query_links(self, skills):
-        return self.collection.query(query_texts=skills, n_results=2).get('metadatas', [])
+        """Flat list of {"links": ...} metadata dicts for the given skills."""
+        return self.pipeline.retrieve(self.pipeline.collection, skills, self.pipeline.config.n_links)
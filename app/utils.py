@@ -1,10 +0,0 @@
-import re
-
-def clean_text(text):
-    text = re.sub(r'<[^>]*?>', '', text)
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '', text)
-    text = re.sub(r'[^a-zA-Z0-9 ]', '', text)
-    text = re.sub(r'\s{2,}', ' ', text)
-    text = text.strip()
-    text = ' '.join(text.split())
-    return text
\ No newline at end of file
@@ -0,0 +1,175 @@
+import os
+import math
+import time
+import queue
+import atexit
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, Future
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
+
+# all-MiniLM-L6-v2, Chroma's default local ONNX embedder
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+_worker_ef = None
+
+
+def _init_worker():
+    global _worker_ef
+    os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+    from chromadb.utils import embedding_functions
+    _worker_ef = embedding_functions.DefaultEmbeddingFunction()
+
+
+def _embed_into(shm_name: str, offset: int, texts: List[str], dim: int) -> int:
+    """Worker: embed texts and write them as float32 rows into the shared output buffer."""
+    # Spawned workers share the parent's resource tracker; the parent unlinks the block
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        vectors = np.asarray(_worker_ef(texts), dtype=np.float32)
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dim {vectors.shape[1]} != EMBEDDING_DIM {dim}")
+        out = np.ndarray((offset + len(texts), dim), dtype=np.float32, buffer=shm.buf)
+        out[offset:offset + len(texts)] = vectors
+        return len(texts)
+    finally:
+        shm.close()
+
+
+class _Request:
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future: Future = Future()
+
+
+class EmbeddingService(EmbeddingFunction):
+    """Chroma embedding function backed by a process pool, micro-batching across threads.
+
+    Calls from any thread are queued; a collector thread gathers requests for up to
+    window_ms (or max_batch texts), splits the combined batch across worker processes
+    and scatters the rows back. Workers write results straight into one shared-memory
+    buffer per batch, so only offsets cross the process boundary.
+    """
+
+    def __init__(self, workers: Optional[int] = None, window_ms: Optional[float] = None, max_batch: int = 128,
+                 dim: int = EMBEDDING_DIM):
+        self.workers = workers or int(os.getenv("EMBEDDING_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+        self.window = float(window_ms if window_ms is not None else os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5")) / 1000
+        self.max_batch = max_batch
+        self.dim = dim
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"),
+                                         initializer=_init_worker)
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0}
+        self._collector = threading.Thread(target=self._collect, name="embedding-batcher", daemon=True)
+        self._collector.start()
+        atexit.register(self.close)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.embed(list(input))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        request = _Request(texts)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = [first], len(first.texts)
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        texts = [text for request in batch for text in request.texts]
+        with self._lock:
+            self._stats["requests"] += len(batch)
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(texts) * self.dim * 4))
+        chunk = max(8, math.ceil(len(texts) / self.workers))
+        futures = [self._pool.submit(_embed_into, shm.name, start, texts[start:start + chunk], self.dim)
+                   for start in range(0, len(texts), chunk)]
+        pending = [len(futures)]
+        pending_lock = threading.Lock()
+
+        def finish(_):
+            with pending_lock:
+                pending[0] -= 1
+                if pending[0]:
+                    return
+            try:
+                errors = [f.exception() for f in futures if f.cancelled() or f.exception()]
+                if errors:
+                    raise errors[0] or RuntimeError("Embedding batch was cancelled")
+                rows = np.ndarray((len(texts), self.dim), dtype=np.float32, buffer=shm.buf).tolist()
+                start = 0
+                for request in batch:
+                    request.future.set_result(rows[start:start + len(request.texts)])
+                    start += len(request.texts)
+            except BaseException as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+            finally:
+                shm.close()
+                shm.unlink()
+
+        for future in futures:
+            future.add_done_callback(finish)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch_texts"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        stats["workers"] = self.workers
+        stats["window_ms"] = self.window * 1000
+        return stats
+
+    def close(self) -> None:
+        if self._collector.is_alive():
+            self._queue.put(None)
+            self._collector.join(timeout=1)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> Optional[EmbeddingService]:
+    """Process-wide embedding service, or None when EMBEDDING_WORKERS=0 (embed in-thread as before)."""
+    global _service
+    if os.getenv("EMBEDDING_WORKERS", "") == "0":
+        return None
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService()
+        return _service
@@ -0,0 +1,185 @@
+import re
+import json
+from typing import Dict, Any, List, Optional
+
+from langchain_core.prompts import PromptTemplate
+from langchain_core.pydantic_v1 import BaseModel, Field, validator
+from langchain_core.exceptions import OutputParserException
+
+
+class Job(BaseModel):
+    """A single job posting extracted from a careers page."""
+    role: str = Field(description="Job title")
+    experience: str = Field(default="", description="Required experience, e.g. '5+ years'")
+    skills: List[str] = Field(default_factory=list, description="Required skills, one per item")
+    description: str = Field(default="", description="Short description of the role")
+
+    @validator("experience", "description", pre=True)
+    def _coerce_text(cls, value):
+        if value is None:
+            return ""
+        if isinstance(value, (list, tuple)):
+            return ", ".join(str(v) for v in value)
+        return str(value)
+
+    @validator("skills", pre=True)
+    def _coerce_skills(cls, value):
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = re.split(r"[,;\n]", value)
+        if isinstance(value, dict):
+            value = list(value.values())
+        return [str(s).strip() for s in value if str(s).strip()]
+
+
+class JobList(BaseModel):
+    """All job postings found on the page."""
+    jobs: List[Job] = Field(default_factory=list)
+
+
+EXTRACT_PROMPT = PromptTemplate.from_template(
+    """
+    ### SCRAPED TEXT FROM WEBSITE:
+    {page_data}
+    ### INSTRUCTION:
+    The scraped text is from the career's page of a website.
+    Your job is to extract the job postings containing the following keys: `role`, `experience`, `skills` and `description`.
+    `skills` must be a list of strings.
+    Only return the valid JSON.
+    ### VALID JSON (NO PREAMBLE):
+    """
+)
+
+
+def repair_json(text: str) -> Any:
+    """Best-effort local repair of near-valid JSON returned by an LLM.
+
+    Handles markdown fences, preambles/trailing chatter, smart quotes, trailing commas,
+    Python literals and unclosed brackets. Raises OutputParserException if still invalid.
+    """
+    if not isinstance(text, str):
+        return text
+    candidate = text.strip()
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+
+    candidate = re.sub(r"^```(?:json)?\s*|\s*```$", "", candidate, flags=re.IGNORECASE)
+    starts = [i for i in (candidate.find("{"), candidate.find("[")) if i != -1]
+    if not starts:
+        raise OutputParserException(f"No JSON object found in output: {text[:200]}")
+    candidate = candidate[min(starts):]
+    ends = [i for i in (candidate.rfind("}"), candidate.rfind("]")) if i != -1]
+    if ends:
+        candidate = candidate[:max(ends) + 1]
+
+    candidate = candidate.replace("“", '"').replace("”", '"').replace("‘", "'").replace("’", "'")
+    candidate = re.sub(r"\bTrue\b", "true", candidate)
+    candidate = re.sub(r"\bFalse\b", "false", candidate)
+    candidate = re.sub(r"\bNone\b", "null", candidate)
+    if '"' not in candidate:
+        candidate = candidate.replace("'", '"')
+    candidate = re.sub(r",\s*([}\]])", r"\1", candidate)
+    candidate = _close_brackets(candidate)
+
+    try:
+        return json.loads(candidate)
+    except ValueError as e:
+        raise OutputParserException(f"Unable to repair JSON output: {e}")
+
+
+def _close_brackets(text: str) -> str:
+    """Append missing closing brackets/quotes for output truncated mid-structure."""
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r",\s*$", "", text)
+    return text + "".join(reversed(stack))
+
+
+def normalize_jobs(data: Any) -> List[Dict[str, Any]]:
+    """Validate parsed output against the Job schema and return plain dicts with list skills."""
+    if isinstance(data, JobList):
+        items = data.jobs
+    elif isinstance(data, Job):
+        items = [data]
+    elif isinstance(data, dict) and isinstance(data.get("jobs"), list):
+        items = data["jobs"]
+    elif isinstance(data, list):
+        items = data
+    else:
+        items = [data]
+
+    jobs = []
+    for item in items:
+        if isinstance(item, Job):
+            jobs.append(item.dict())
+        elif isinstance(item, dict):
+            try:
+                jobs.append(Job.parse_obj(item).dict())
+            except Exception as e:
+                print(f"Skipping job that failed validation: {e}")
+    return jobs
+
+
+def _raw_text(message: Any) -> Optional[str]:
+    """Pull the text to repair out of an AIMessage: malformed tool-call args first, then content."""
+    if message is None:
+        return None
+    for call in getattr(message, "invalid_tool_calls", None) or []:
+        if call.get("args"):
+            return call["args"]
+    content = getattr(message, "content", message)
+    return content if isinstance(content, str) and content.strip() else None
+
+
+def extract_jobs_structured(llm: Any, page_data: str, max_retries: int = 1) -> List[Dict[str, Any]]:
+    """Extract jobs using the provider's structured output, repairing near-valid JSON locally.
+
+    Order of attempts: structured/function-calling output; local repair of the raw reply;
+    only then a fresh plain-text call (up to max_retries), itself repaired before giving up.
+    """
+    raw_text = None
+    try:
+        structured = EXTRACT_PROMPT | llm.with_structured_output(JobList, include_raw=True)
+        res = structured.invoke({"page_data": page_data})
+        if res.get("parsed") is not None:
+            return normalize_jobs(res["parsed"])
+        raw_text = _raw_text(res.get("raw"))
+    except NotImplementedError:
+        pass
+    except Exception as e:
+        print(f"Structured extraction failed, falling back to plain output: {e}")
+
+    if raw_text:
+        try:
+            return normalize_jobs(repair_json(raw_text))
+        except OutputParserException:
+            pass
+
+    last_err = None
+    for _ in range(max_retries):
+        res = (EXTRACT_PROMPT | llm).invoke({"page_data": page_data})
+        try:
+            return normalize_jobs(repair_json(res.content))
+        except OutputParserException as e:
+            last_err = e
+    raise last_err or OutputParserException("Context too big. Unable to parse jobs.")
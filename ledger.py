@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlparse
+from typing import Dict, Any, List, Optional
+
+from singleflight import job_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    company TEXT,
+    role TEXT,
+    role_hash TEXT NOT NULL,
+    url TEXT,
+    job_key TEXT NOT NULL,
+    job_json TEXT NOT NULL,
+    links_json TEXT NOT NULL,
+    email TEXT NOT NULL,
+    source TEXT NOT NULL,
+    timings_json TEXT,
+    prompt TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_generations_company ON generations(company, created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_role_hash ON generations(role_hash, created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_url ON generations(url, created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_created_at ON generations(created_at);
+CREATE INDEX IF NOT EXISTS idx_generations_job_key ON generations(job_key, created_at);
+"""
+
+
+# Hosted job boards: the company is the first path segment (boards.greenhouse.io/acme) ...
+ATS_PATH_HOSTS = ("greenhouse.io", "lever.co", "ashbyhq.com", "smartrecruiters.com", "workable.com",
+                  "jobvite.com", "polymer.co", "rippling.com")
+# ... or the first host label (acme.wd5.myworkdayjobs.com, acme.bamboohr.com, careers-acme.icims.com)
+ATS_SUBDOMAIN_HOSTS = ("myworkdayjobs.com", "bamboohr.com", "breezy.hr", "recruitee.com", "teamtailor.com",
+                       "icims.com", "jobs.personio.de", "personio.de")
+GENERIC_LABELS = ("www", "jobs", "careers", "boards", "job-boards", "apply", "career", "en")
+SECOND_LEVEL = ("co", "com", "org", "net", "ac", "gov", "edu", "ne", "or", "ltd", "plc")
+
+
+def _registrable_labels(labels: List[str]) -> int:
+    """Number of trailing labels forming the public suffix: 2 for example.co.uk, else 1."""
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL:
+        return 2
+    return 1
+
+
+def company_from_url(url: Optional[str]) -> Optional[str]:
+    """Best-effort company name from a careers URL.
+
+    https://jobs.nike.com/... -> nike, careers.tesco.co.uk -> tesco,
+    boards.greenhouse.io/acme -> acme, acme.wd5.myworkdayjobs.com -> acme.
+    An explicit company, when the caller has one, should always win over this.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    segments = [seg for seg in parsed.path.split("/") if seg]
+    for ats in ATS_PATH_HOSTS:
+        if host == ats or host.endswith("." + ats):
+            return segments[0].lower() if segments else None
+    for ats in ATS_SUBDOMAIN_HOSTS:
+        if host.endswith("." + ats):
+            label = host[:-len(ats) - 1].split(".")[0]
+            label = label[len("careers-"):] if label.startswith("careers-") else label
+            return label if label not in GENERIC_LABELS else None
+    labels = host.split(".")
+    labels = labels[:len(labels) - _registrable_labels(labels)]
+    labels = [label for label in labels if label not in GENERIC_LABELS]
+    return labels[-1] if labels else None
+
+
+def role_hash(role: str) -> str:
+    """Hash of the case/whitespace-normalized role title."""
+    return hashlib.sha256(" ".join(str(role).lower().split()).encode("utf-8")).hexdigest()
+
+
+class GenerationLedger:
+    """Append-only SQLite record of every generated email.
+
+    Rows are only ever inserted. Lookups by job, company, role and URL are served
+    from indexes so callers can reuse a recent email instead of regenerating it.
+    """
+
+    def __init__(self, path: Optional[str] = None, reuse_seconds: Optional[float] = None):
+        self.path = path or os.getenv("LEDGER_PATH", "./ledger.db")
+        self.reuse_seconds = float(reuse_seconds if reuse_seconds is not None
+                                   else os.getenv("LEDGER_REUSE_SECONDS", str(30 * 24 * 3600)))
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(generations)")}
+            if "prompt" not in columns:
+                # Ledgers created before prompts were fingerprinted
+                conn.execute("ALTER TABLE generations ADD COLUMN prompt TEXT")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, job: Dict[str, Any], links: List[Dict[str, Any]], email: str, source: str = "generated",
+               url: Optional[str] = None, company: Optional[str] = None,
+               timings: Optional[Dict[str, float]] = None, prompt: Optional[str] = None) -> int:
+        """Append one generation; returns its row id. prompt is the prompt_key it was written with."""
+        company = (company or company_from_url(url) or "").lower() or None
+        with self._conn() as conn:
+            cur = conn.execute(
+                "INSERT INTO generations (created_at, company, role, role_hash, url, job_key, job_json, "
+                "links_json, email, source, timings_json, prompt) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), company, job.get("role"), role_hash(job.get("role", "")), url,
+                 job_key(job, prompt or ""), json.dumps(job), json.dumps(links), email, source,
+                 json.dumps(timings) if timings else None, prompt)
+            )
+            return cur.lastrowid
+
+    def recent(self, job: Dict[str, Any], url: Optional[str] = None, max_age_seconds: Optional[float] = None,
+               prompt: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent email for the same job (same payload, or same role at the same URL) within the reuse window.
+
+        Only emails written with the same prompt (prompt_key) are returned.
+        """
+        since = time.time() - (self.reuse_seconds if max_age_seconds is None else max_age_seconds)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT * FROM generations WHERE job_key = ? AND created_at >= ? ORDER BY created_at DESC LIMIT 1",
+            (job_key(job, prompt or ""), since)
+        ).fetchone()
+        if row is None and url:
+            row = conn.execute(
+                "SELECT * FROM generations WHERE url = ? AND role_hash = ? AND prompt IS ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (url, role_hash(job.get("role", "")), prompt, since)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def history(self, company: Optional[str] = None, url: Optional[str] = None, role: Optional[str] = None,
+                since: Optional[float] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Past generations filtered by any of company/url/role/since, newest first."""
+        clauses, params = [], []
+        if company:
+            clauses.append("company = ?")
+            params.append(company.lower())
+        if url:
+            clauses.append("url = ?")
+            params.append(url)
+        if role:
+            clauses.append("role_hash = ?")
+            params.append(role_hash(role))
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT * FROM generations {where} ORDER BY created_at DESC LIMIT ?", (*params, int(limit))
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def contacted_recently(self, company: str, within_seconds: Optional[float] = None) -> bool:
+        """Whether any email for this company was generated within the window."""
+        since = time.time() - (self.reuse_seconds if within_seconds is None else within_seconds)
+        row = self._conn().execute(
+            "SELECT 1 FROM generations WHERE company = ? AND created_at >= ? LIMIT 1", (company.lower(), since)
+        ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        item["job"] = json.loads(item.pop("job_json"))
+        item["links"] = json.loads(item.pop("links_json"))
+        timings = item.pop("timings_json")
+        item["timings"] = json.loads(timings) if timings else None
+        return item
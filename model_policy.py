@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+from typing import Dict, Any, List, Callable, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.exceptions import OutputParserException
+from langchain_openai import ChatOpenAI
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+# USD per 1M tokens (input, output); unknown models are reported with zero cost
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+}
+
+# Per-stage defaults: (base model, escalation model, temperature) per provider
+STAGE_DEFAULTS = {
+    "extract": {"openai": ("gpt-4o-mini", "gpt-4o", 0.0), "gemini": ("gemini-1.5-flash", "gemini-1.5-pro", 0.0)},
+    "short_email": {"openai": ("gpt-4o-mini", "gpt-4o", 0.7), "gemini": ("gemini-1.5-flash", "gemini-1.5-pro", 0.7)},
+    "long_email": {"openai": ("gpt-4o-mini", "gpt-4o", 0.7), "gemini": ("gemini-1.5-flash", "gemini-1.5-pro", 0.7)},
+}
+
+LONG_EMAIL_WORDS = int(os.getenv("LONG_EMAIL_WORDS", "250"))
+EMAIL_WORD_LIMIT = 200
+
+
+def email_stage(job: Dict[str, Any]) -> str:
+    """Route long/complex job descriptions to the long_email stage."""
+    words = len(str(job.get("description", "")).split())
+    skills = job.get("skills") or []
+    if isinstance(skills, str):
+        skills = [s for s in skills.split(",") if s.strip()]
+    return "long_email" if words > LONG_EMAIL_WORDS or len(skills) > 8 else "short_email"
+
+
+def validate_jobs(jobs: List[Dict[str, Any]]) -> bool:
+    """Every extracted job needs a role; a page without postings is a valid empty result."""
+    return isinstance(jobs, list) and all(job.get("role") for job in jobs)
+
+
+def validate_email(email: str, links: Optional[List[Dict[str, Any]]] = None, require_subject: bool = True) -> bool:
+    """Cheap checks mirroring the prompt: subject line, word limit (with slack), portfolio links.
+
+    Pass require_subject=False for prompts that do not ask for a subject line.
+    """
+    if not email or (require_subject and "subject" not in email.lower()):
+        return False
+    if len(email.split()) > EMAIL_WORD_LIMIT * 1.25:
+        return False
+    urls = [link.get("links") for link in links or [] if link.get("links")]
+    return not urls or any(url in email for url in urls)
+
+
+class _UsageHandler(BaseCallbackHandler):
+    """Accumulates token usage for every call made through one stage/model LLM."""
+
+    def __init__(self, policy: "ModelPolicy", stage: str, model: str):
+        self.policy = policy
+        self.stage = stage
+        self.model = model
+
+    def on_llm_end(self, response, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            # n>1 choices of one request all carry that request's total usage; count it once
+            if not generations:
+                continue
+            usage = getattr(getattr(generations[0], "message", None), "usage_metadata", None) or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+        self.policy._record_usage(self.stage, self.model, input_tokens, output_tokens)
+
+
+class ModelPolicy:
+    """Per-stage model selection with escalation on validation failure and cost/latency reporting.
+
+    Models are overridable per provider and stage, e.g. OPENAI_EXTRACT_MODEL,
+    OPENAI_EXTRACT_ESCALATION_MODEL, EXTRACT_TEMPERATURE, GEMINI_LONG_EMAIL_MODEL.
+    """
+
+    def __init__(self, provider: Optional[str] = None):
+        self.provider = provider or self._pick_provider()
+        self._llms: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _pick_provider() -> str:
+        preferred = os.getenv("LLM_PROVIDER", "openai").lower()
+        has_openai = bool(os.getenv('OPENAI_API_KEY'))
+        has_gemini = bool(os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY'))
+        if preferred == "gemini":
+            return "gemini" if has_gemini or not has_openai else "openai"
+        return "openai" if has_openai or not has_gemini else "gemini"
+
+    def models_for(self, stage: str) -> List[str]:
+        base, escalation, _ = STAGE_DEFAULTS[stage][self.provider]
+        prefix = f"{self.provider.upper()}_{stage.upper()}"
+        base = os.getenv(f"{prefix}_MODEL") or os.getenv(f"{self.provider.upper()}_MODEL") or base
+        escalation = os.getenv(f"{prefix}_ESCALATION_MODEL", escalation)
+        return [base] if not escalation or escalation == base else [base, escalation]
+
+    def temperature_for(self, stage: str) -> float:
+        return float(os.getenv(f"{stage.upper()}_TEMPERATURE", STAGE_DEFAULTS[stage][self.provider][2]))
+
+    def llm_for(self, stage: str, model: str):
+        key = (stage, model)
+        with self._lock:
+            if key not in self._llms:
+                handler = _UsageHandler(self, stage, model)
+                temperature = self.temperature_for(stage)
+                if self.provider == "openai":
+                    self._llms[key] = ChatOpenAI(temperature=temperature, openai_api_key=os.getenv('OPENAI_API_KEY'),
+                                                 model_name=model, callbacks=[handler])
+                else:
+                    google_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
+                    self._llms[key] = ChatGoogleGenerativeAI(temperature=temperature, google_api_key=google_key,
+                                                             model=model, callbacks=[handler])
+            return self._llms[key]
+
+    def run(self, stage: str, fn: Callable[[Any], Any], validate: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Call fn(llm) with the stage's base model, escalating to the stronger model only when
+        the output fails to parse (OutputParserException) or fails validate.
+
+        Other errors (rate limits, timeouts, auth) are re-raised rather than retried on the
+        pricier model. If every tier fails validation the last output is returned; if every
+        tier fails to parse, the last parse error is re-raised.
+        """
+        last_result, last_err, have_result = None, None, False
+        for tier, model in enumerate(self.models_for(stage)):
+            start = time.perf_counter()
+            try:
+                result = fn(self.llm_for(stage, model))
+            except Exception as e:
+                self._record_call(stage, model, time.perf_counter() - start, ok=False, escalated=tier > 0)
+                print(f"{stage} failed on {model}: {e}")
+                if not isinstance(e, OutputParserException):
+                    raise
+                last_err = e
+                continue
+            ok = validate is None or validate(result)
+            self._record_call(stage, model, time.perf_counter() - start, ok=ok, escalated=tier > 0)
+            if ok:
+                return result
+            last_result, have_result = result, True
+        if have_result:
+            return last_result
+        raise last_err or RuntimeError(f"No model available for stage {stage}")
+
+    def run_batch(self, stage: str, fn: Callable[[Any, List[Any]], List[Any]], inputs: List[Any],
+                  validate: Optional[Callable[[Any, Any], bool]] = None) -> List[Any]:
+        """Batched run(): fn(llm, inputs) returns one output (or exception) per input.
+
+        Only the items whose output fails to parse (OutputParserException) or fails
+        validate(input, output) are escalated, together, to the next tier; other errors are
+        kept as that item's result. Items failing every tier keep their last output, or their exception.
+        """
+        results: List[Any] = [None] * len(inputs)
+        pending = list(range(len(inputs)))
+        for tier, model in enumerate(self.models_for(stage)):
+            if not pending:
+                break
+            start = time.perf_counter()
+            try:
+                outputs = fn(self.llm_for(stage, model), [inputs[i] for i in pending])
+            except Exception as e:
+                outputs = [e] * len(pending)
+            latency = time.perf_counter() - start
+            still_failing = []
+            for i, output in zip(pending, outputs):
+                ok = not isinstance(output, Exception) and (validate is None or validate(inputs[i], output))
+                self._record_call(stage, model, latency, ok=ok, escalated=tier > 0)
+                if not ok and (not isinstance(output, Exception) or isinstance(output, OutputParserException)):
+                    still_failing.append(i)
+                # Never replace an earlier real (if invalid) output with a later exception
+                if not isinstance(output, Exception) or results[i] is None or isinstance(results[i], Exception):
+                    results[i] = output
+            pending = still_failing
+        return results
+
+    def _stage(self, stage: str) -> Dict[str, Any]:
+        return self._stats.setdefault(stage, {
+            "calls": 0, "failures": 0, "escalations": 0, "latency_total": 0.0, "latency_max": 0.0,
+            "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "models": {},
+        })
+
+    def _record_call(self, stage: str, model: str, latency: float, ok: bool, escalated: bool) -> None:
+        with self._lock:
+            stats = self._stage(stage)
+            stats["calls"] += 1
+            stats["failures"] += int(not ok)
+            stats["escalations"] += int(escalated)
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            stats["models"][model] = stats["models"].get(model, 0) + 1
+
+    def _record_usage(self, stage: str, model: str, input_tokens: int, output_tokens: int) -> None:
+        price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self._stage(stage)
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["cost_usd"] += (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+    def report(self) -> Dict[str, Any]:
+        """Per-stage calls, failures, escalations, latency and estimated cost."""
+        with self._lock:
+            report = {}
+            for stage, stats in self._stats.items():
+                row = {k: (dict(v) if isinstance(v, dict) else v) for k, v in stats.items()}
+                row["latency_avg"] = stats["latency_total"] / stats["calls"] if stats["calls"] else 0.0
+                report[stage] = row
+            return {"provider": self.provider, "stages": report}
@@ -0,0 +1,150 @@
+import re
+from typing import Dict, Any, List, Union
+
+from bs4 import BeautifulSoup
+
+from job_schema import normalize_jobs, repair_json
+
+NOISE_TAGS = ["script", "style", "noscript", "nav", "footer", "aside", "form", "iframe", "svg", "button"]
+NOISE_ATTR = re.compile(r"cookie|consent|gdpr|navbar|nav-|menu|footer|breadcrumb|social|share|newsletter|subscribe|modal|popup", re.I)
+BLOCK_TAGS = ["main", "article", "section", "div", "ul", "ol", "table"]
+JOB_TERMS = re.compile(
+    r"\b(responsibilit\w*|requirements?|qualifications?|experience|skills?|years|apply|salary|"
+    r"full[- ]time|part[- ]time|remote|hybrid|location|role|position|job|team|benefits|degree)\b",
+    re.I
+)
+
+
+def _soup(page: Union[str, BeautifulSoup]) -> BeautifulSoup:
+    return page if isinstance(page, BeautifulSoup) else BeautifulSoup(page, "html.parser")
+
+
+def _walk_jsonld(node: Any):
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_jsonld(item)
+    elif isinstance(node, dict):
+        types = node.get("@type", [])
+        types = types if isinstance(types, list) else [types]
+        if "JobPosting" in types:
+            yield node
+        for key in ("@graph", "itemListElement", "item", "mainEntity"):
+            if key in node:
+                yield from _walk_jsonld(node[key])
+
+
+def _experience(value: Any) -> str:
+    if isinstance(value, dict):
+        months = value.get("monthsOfExperience")
+        if months:
+            try:
+                return f"{round(float(months) / 12, 1):g}+ years"
+            except (TypeError, ValueError):
+                pass
+        return str(value.get("description", ""))
+    return str(value or "")
+
+
+def jsonld_jobs(page: Union[str, BeautifulSoup]) -> List[Dict[str, Any]]:
+    """Jobs described by schema.org JobPosting JSON-LD blocks, mapped onto the Job schema."""
+    soup = _soup(page)
+    jobs = []
+    for script in soup.find_all("script", attrs={"type": re.compile(r"ld\+json", re.I)}):
+        raw = script.string or script.get_text()
+        if not raw or "JobPosting" not in raw:
+            continue
+        try:
+            data = repair_json(raw)
+        except Exception:
+            continue
+        for posting in _walk_jsonld(data):
+            description = BeautifulSoup(str(posting.get("description", "")), "html.parser").get_text(" ")
+            jobs.append({
+                "role": posting.get("title", ""),
+                "experience": _experience(posting.get("experienceRequirements")),
+                "skills": posting.get("skills") or posting.get("qualifications") or [],
+                "description": " ".join(description.split()),
+            })
+    return normalize_jobs(jobs)
+
+
+def _block_text(tag) -> str:
+    lines = (" ".join(line.split()) for line in tag.get_text("\n").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _score(tag, text: str) -> float:
+    words = len(text.split())
+    if words < 20:
+        return 0.0
+    link_chars = sum(len(a.get_text(strip=True)) for a in tag.find_all("a"))
+    link_density = link_chars / max(len(text), 1)
+    headings = len(tag.find_all(["h1", "h2", "h3", "h4"]))
+    items = len(tag.find_all("li"))
+    terms = len(JOB_TERMS.findall(text))
+    score = terms * 2 + headings * 3 + min(items, 20)
+    # Prefer dense, job-specific blocks over whole-page wrappers
+    score *= (1.0 - link_density) * min(1.0, 400 / words + 0.25)
+    return score
+
+
+def job_regions(page: Union[str, BeautifulSoup], max_chars: int = 6000, min_score: float = 4.0) -> str:
+    """Text of the highest-scoring job-like regions of a page, in document order, up to max_chars."""
+    soup = _soup(page)
+    for tag in soup.find_all(NOISE_TAGS):
+        tag.decompose()
+    # Only the site-wide header is chrome; <article><header><h1>Role</h1> carries the job title
+    if soup.body:
+        for tag in soup.body.find_all("header", recursive=False):
+            if not tag.find(["h1", "h2"]):
+                tag.decompose()
+    for tag in soup.find_all(True):
+        if getattr(tag, "decomposed", False):
+            continue
+        attrs = " ".join([tag.get("id") or ""] + list(tag.get("class") or []))
+        if (attrs.strip() and NOISE_ATTR.search(attrs) and tag.name not in ("main", "article", "body")
+                and not tag.find(["h1", "h2"])):
+            tag.decompose()
+    title = soup.find("h1")
+    title = " ".join(title.get_text(" ").split()) if title else ""
+
+    candidates = []
+    for position, tag in enumerate(soup.find_all(BLOCK_TAGS)):
+        text = _block_text(tag)
+        score = _score(tag, text)
+        if score >= min_score:
+            candidates.append((score, position, tag, text))
+
+    chosen = []
+    total = 0
+    for score, position, tag, text in sorted(candidates, key=lambda c: -c[0]):
+        if any(tag in c[2].descendants or c[2] in tag.descendants for c in chosen):
+            continue
+        if total + len(text) > max_chars and chosen:
+            continue
+        chosen.append((score, position, tag, text[:max_chars]))
+        total += len(text)
+
+    if not chosen:
+        body = soup.body or soup
+        return _block_text(body)[:max_chars]
+    text = "\n\n".join(c[3] for c in sorted(chosen, key=lambda c: c[1]))
+    # Keep the page title (usually the role) even when it sits outside the chosen blocks
+    if title and title not in text:
+        text = f"{title}\n\n{text}"
+    return text
+
+
+def prefilter_page(page: Union[str, BeautifulSoup], max_chars: int = 6000) -> Dict[str, Any]:
+    """Parse a raw careers page once and decide what (if anything) the LLM needs to see.
+
+    Returns {"jobs": [...]} when JobPosting JSON-LD is present (no LLM extraction needed),
+    otherwise {"jobs": [], "text": <job-relevant regions>}; both include size stats.
+    """
+    soup = _soup(page)
+    chars_in = len(soup.get_text(" ", strip=True))
+    jobs = jsonld_jobs(soup)
+    if jobs:
+        return {"jobs": jobs, "text": "", "source": "jsonld", "chars_in": chars_in, "chars_out": 0}
+    text = job_regions(soup, max_chars=max_chars)
+    return {"jobs": [], "text": text, "source": "regions", "chars_in": chars_in, "chars_out": len(text)}
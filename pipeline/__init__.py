@@ -0,0 +1,16 @@
+"""Shared cold-email pipeline used by emailgen.py, webapp/app.py and the Streamlit app in app/."""
+
+from .config import PROJECT_ROOT, PipelineConfig
+from .stages import (
+    EMAIL_PROMPT, email_variables, initialize_llm, load_webpage, fetch_page, clean_page,
+    extract_job_details, initialize_chroma_collection, populate_portfolio, get_relevant_links,
+    generate_cold_email, generate_cold_email_variants,
+)
+from .core import EmailPipeline
+
+__all__ = [
+    "PROJECT_ROOT", "PipelineConfig", "EmailPipeline",
+    "EMAIL_PROMPT", "email_variables", "initialize_llm", "load_webpage", "fetch_page", "clean_page",
+    "extract_job_details", "initialize_chroma_collection", "populate_portfolio", "get_relevant_links",
+    "generate_cold_email", "generate_cold_email_variants",
+]
@@ -0,0 +1,45 @@
+import os
+import logging
+from typing import Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('USER_AGENT', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+# Chroma/telemetry quieting
+os.environ.setdefault('CHROMA_TELEMETRY_DISABLED', 'true')
+os.environ.setdefault('CHROMA_ANONYMIZED_TELEMETRY', 'false')
+os.environ.setdefault('PYTHONWARNINGS', 'ignore')
+os.environ.setdefault('POSTHOG_DISABLED', 'true')
+logging.getLogger("chromadb").setLevel(logging.ERROR)
+logging.getLogger("opentelemetry").setLevel(logging.ERROR)
+
+
+def _flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+class PipelineConfig:
+    """Settings shared by every entry point; anything not passed falls back to its env var.
+
+    Paths default to the project root, so the CLI, Flask and Streamlit apps share the
+    same vector store, semantic cache and ledger regardless of the working directory.
+    """
+
+    def __init__(self, vectorstore_path: Optional[str] = None, portfolio_csv: Optional[str] = None,
+                 n_links: Optional[int] = None, semantic_cache: Optional[bool] = None,
+                 semantic_cache_path: Optional[str] = None, ledger: Optional[bool] = None,
+                 ledger_path: Optional[str] = None, batching: Optional[bool] = None,
+                 max_workers: Optional[int] = None, stream_max_pages: Optional[int] = None,
+                 stream_in_flight: Optional[int] = None):
+        self.vectorstore_path = vectorstore_path or os.getenv("VECTORSTORE_PATH", os.path.join(PROJECT_ROOT, "vectorstore"))
+        self.portfolio_csv = portfolio_csv or os.getenv("PORTFOLIO_CSV", os.path.join(PROJECT_ROOT, "my_portfolio.csv"))
+        self.n_links = int(n_links or os.getenv("PORTFOLIO_LINKS", "2"))
+        self.semantic_cache = semantic_cache if semantic_cache is not None else _flag("SEMANTIC_CACHE_ENABLED")
+        self.semantic_cache_path = semantic_cache_path or os.getenv("SEMANTIC_CACHE_PATH", os.path.join(PROJECT_ROOT, "semantic_cache"))
+        self.ledger = ledger if ledger is not None else _flag("LEDGER_ENABLED")
+        self.ledger_path = ledger_path or os.getenv("LEDGER_PATH", os.path.join(PROJECT_ROOT, "ledger.db"))
+        self.batching = batching if batching is not None else _flag("LLM_BATCH_ENABLED")
+        self.max_workers = int(max_workers or os.getenv("PIPELINE_MAX_WORKERS", "4"))
+        self.stream_max_pages = int(stream_max_pages or os.getenv("STREAM_MAX_PAGES", "50"))
+        self.stream_in_flight = int(stream_in_flight or os.getenv("STREAM_IN_FLIGHT", "4"))
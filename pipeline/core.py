@@ -0,0 +1,276 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Iterator, Optional, Tuple
+
+import pandas as pd
+from langchain_core.prompts import PromptTemplate
+
+from model_policy import ModelPolicy, email_stage, validate_email, validate_jobs
+from semantic_cache import SemanticEmailCache
+from singleflight import generation_flight, job_key, prompt_key
+from ledger import GenerationLedger, company_from_url
+from request_batcher import LLMRequestBatcher, openai_batch_complete
+from embedding_service import get_embedding_service
+from streaming import stream_emails
+
+from .config import PipelineConfig
+from .stages import (
+    EMAIL_PROMPT, email_variables, fetch_page, clean_page, extract_job_details,
+    initialize_chroma_collection, populate_portfolio, get_relevant_links,
+    generate_cold_email, generate_cold_email_variants,
+)
+
+
+class EmailPipeline:
+    """fetch -> clean -> extract -> retrieve -> generate, shared by emailgen.py, the webapp and the Streamlit app.
+
+    Every stage is a plain callable and can be replaced in the constructor:
+    fetch(url), clean(page) -> {"jobs", "text"}, extract(text, llm) -> jobs,
+    retrieve(collection, skills, n_results) -> links, generate(job, links, llm) -> email;
+    validate(email, links) is the check that goes with the prompt.
+    Shared components (model policy, portfolio collection, semantic cache, ledger and
+    request batcher) are created lazily from the config, or injected, and reused
+    across calls and threads so caching, batching and stats apply to every caller.
+    """
+
+    def __init__(self, config: Optional[PipelineConfig] = None, fetch: Optional[Callable] = None,
+                 clean: Optional[Callable] = None, extract: Optional[Callable] = None,
+                 retrieve: Optional[Callable] = None, generate: Optional[Callable] = None,
+                 prompt: PromptTemplate = EMAIL_PROMPT,
+                 variables: Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]] = email_variables,
+                 policy: Optional[ModelPolicy] = None, collection: Optional[Any] = None,
+                 cache: Optional[SemanticEmailCache] = None, ledger: Optional[GenerationLedger] = None,
+                 embedding_function: Optional[Any] = None,
+                 validate: Callable[[str, List[Dict[str, Any]]], bool] = validate_email):
+        self.config = config or PipelineConfig()
+        self.prompt = prompt
+        self.variables = variables
+        # validate(email, links) must match what the prompt asks for; failures escalate to the stronger model
+        self.validate = validate
+        # Ledger rows, cache entries and single-flight keys are scoped to the prompt, so
+        # entry points with different personas sharing one store never get each other's emails
+        self.prompt_key = prompt_key(prompt)
+        self.fetch = fetch or fetch_page
+        self.clean = clean or clean_page
+        self.extract = extract or extract_job_details
+        self.retrieve = retrieve or get_relevant_links
+        # The request batcher renders prompt/variables itself, so it only applies to the default generate stage
+        self._custom_generate = generate is not None
+        self.generate = generate or (lambda job, links, llm: generate_cold_email(job, links, llm, self.prompt, self.variables))
+        self._policy = policy
+        self._collection = collection
+        self._cache = cache
+        self._ledger = ledger
+        self._embedding_function = embedding_function
+        self._batcher = None
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------ shared components
+
+    @property
+    def embedding_function(self):
+        return self._embedding_function if self._embedding_function is not None else get_embedding_service()
+
+    @property
+    def policy(self) -> ModelPolicy:
+        with self._lock:
+            if self._policy is None:
+                self._policy = ModelPolicy()
+            return self._policy
+
+    @property
+    def collection(self):
+        """Portfolio collection, opened and populated once per pipeline."""
+        with self._lock:
+            if self._collection is None:
+                collection = initialize_chroma_collection(self.config.vectorstore_path, self.embedding_function)
+                populate_portfolio(collection, pd.read_csv(self.config.portfolio_csv))
+                self._collection = collection
+            return self._collection
+
+    @property
+    def cache(self) -> Optional[SemanticEmailCache]:
+        if not self.config.semantic_cache:
+            return None
+        with self._lock:
+            if self._cache is None:
+                self._cache = SemanticEmailCache(path=self.config.semantic_cache_path,
+                                                 embedding_function=self.embedding_function)
+            return self._cache
+
+    @property
+    def ledger(self) -> Optional[GenerationLedger]:
+        if not self.config.ledger:
+            return None
+        with self._lock:
+            if self._ledger is None:
+                self._ledger = GenerationLedger(path=self.config.ledger_path)
+            return self._ledger
+
+    @property
+    def batcher(self) -> Optional[LLMRequestBatcher]:
+        if not self.config.batching or self._custom_generate:
+            return None
+        with self._lock:
+            if self._batcher is None:
+                self._batcher = LLMRequestBatcher(self.policy, self.prompt)
+            return self._batcher
+
+    # ------------------------------------------------------------ stages
+
+    def extract_jobs(self, text: str) -> List[Dict[str, Any]]:
+        return self.policy.run("extract", lambda llm: self.extract(text, llm), validate_jobs)
+
+    def jobs_from_url(self, url: str) -> List[Dict[str, Any]]:
+        """Fetch and clean one page; JobPosting JSON-LD skips LLM extraction entirely."""
+        try:
+            page = self.clean(self.fetch(url))
+            return page["jobs"] or self.extract_jobs(page["text"])
+        except Exception as e:
+            print(f"Error extracting jobs from {url}: {e}")
+            raise
+
+    def links_for(self, job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return self.retrieve(self.collection, job.get("skills", []), self.config.n_links)
+
+    def write_email(self, job: Dict[str, Any], links: List[Dict[str, Any]]) -> str:
+        """Generate one email through the request batcher, or directly with model escalation."""
+        batcher = self.batcher
+        if batcher is not None:
+            return batcher.submit(email_stage(job), self.variables(job, links), lambda text: self.validate(text, links))
+        return self.policy.run(email_stage(job), lambda llm: self.generate(job, links, llm),
+                               lambda text: self.validate(text, links))
+
+    # ------------------------------------------------------------ end-to-end
+
+    def generate_email(self, job: Dict[str, Any], variants: int = 1, url: Optional[str] = None,
+                       company: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+        """Email for one job as a JSON-able payload.
+
+        A recent ledger entry for the same job is returned as-is unless force is set;
+        identical concurrent requests share one pipeline run ("coalesced"). Each coalesced
+        caller still gets its own previously_contacted check and ledger row for its url/company.
+        """
+        company = company or company_from_url(url)
+        key = job_key(job, self.prompt_key)
+        key = key if variants == 1 else f"{key}:variants={variants}"
+        ledger = self.ledger
+        if variants == 1 and not force and ledger is not None:
+            previous = ledger.recent(job, url=url, prompt=self.prompt_key)
+            if previous is not None:
+                return {"email": previous["email"], "ledger": True, "generated_at": previous["created_at"]}
+        (result, links), shared = generation_flight.do(key, lambda: self._run(job, variants, url, company))
+        if shared:
+            previously_contacted = bool(company) and ledger is not None and ledger.contacted_recently(company)
+            if ledger is not None:
+                ledger.record(job, links, result["email"], source="coalesced", url=url, company=company,
+                              prompt=self.prompt_key)
+            result = {**result, "coalesced": True, "previously_contacted": previously_contacted}
+        return result
+
+    def _run(self, job: Dict[str, Any], variants: int, url: Optional[str],
+             company: Optional[str]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Retrieve links and generate (or reuse) the email; returns (payload, links).
+
+        Every outcome is appended to the ledger.
+
+        With variants > 1 the semantic cache is bypassed and the best-ranked candidate is
+        returned as "email" alongside scored "alternates".
+        """
+        ledger = self.ledger
+        previously_contacted = bool(company) and ledger is not None and ledger.contacted_recently(company)
+        timings = {}
+        start = time.perf_counter()
+        links = self.links_for(job)
+        timings["retrieval"] = time.perf_counter() - start
+
+        def finish(result: Dict[str, Any], source: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+            timings["total"] = time.perf_counter() - start
+            if ledger is not None:
+                ledger.record(job, links, result["email"], source=source, url=url, company=company,
+                              timings=timings, prompt=self.prompt_key)
+            return {**result, "previously_contacted": previously_contacted, "timings": dict(timings)}, links
+
+        if variants > 1:
+            ranked = self.policy.run(
+                email_stage(job),
+                lambda llm: generate_cold_email_variants(job, links, llm, variants, self.prompt, self.variables),
+                lambda res: self.validate(res["email"], links)
+            )
+            timings["generation"] = time.perf_counter() - start - timings["retrieval"]
+            return finish({"email": ranked["email"], "score": ranked["best"], "alternates": ranked["alternates"]}, "variants")
+
+        cache = self.cache
+        if cache is not None:
+            cached = cache.lookup(job, links, self.prompt_key)
+            if cached is not None:
+                return finish({"email": cached["email"], "cached": True, "similarity": cached["similarity"]}, "semantic_cache")
+
+        email = self.write_email(job, links)
+        timings["generation"] = time.perf_counter() - start - timings["retrieval"]
+        if cache is not None:
+            cache.store(job, links, email, self.prompt_key)
+        return finish({"email": email}, "generated")
+
+    def generate_emails(self, jobs: List[Dict[str, Any]], url: Optional[str] = None,
+                        company: Optional[str] = None, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """generate_email for many jobs concurrently; concurrent calls share request batches."""
+        with ThreadPoolExecutor(max_workers=max_workers or self.config.max_workers) as pool:
+            return list(pool.map(lambda job: self.generate_email(job, url=url, company=company), jobs))
+
+    def generate_emails_batch_api(self, jobs: List[Dict[str, Any]]) -> List[str]:
+        """Generate emails through the OpenAI Batch API (non-interactive, discounted).
+
+        Emails that fail validation there are regenerated interactively with the normal
+        model escalation.
+        """
+        policy = self.policy
+        links = [self.links_for(job) for job in jobs]
+        emails: List[str] = [None] * len(jobs)
+        by_stage: Dict[str, List[int]] = {}
+        for i, job in enumerate(jobs):
+            by_stage.setdefault(email_stage(job), []).append(i)
+        for stage, indices in by_stage.items():
+            prompts = [self.prompt.format(**self.variables(jobs[i], links[i])) for i in indices]
+            outputs = openai_batch_complete(prompts, policy.models_for(stage)[0], policy.temperature_for(stage))
+            for i, output in zip(indices, outputs):
+                if output and self.validate(output, links[i]):
+                    emails[i] = output
+                else:
+                    emails[i] = policy.run(stage, lambda llm, i=i: self.generate(jobs[i], links[i], llm),
+                                           lambda email, i=i: self.validate(email, links[i]))
+        return emails
+
+    def stream(self, url: str, max_pages: Optional[int] = None,
+               max_in_flight: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Crawl a paginated careers site lazily (see streaming.py), yielding each job's payload as it is ready.
+
+        Yields generate_email payloads extended with "url", "job" and "error".
+        """
+        max_in_flight = max_in_flight or self.config.stream_in_flight
+        company = company_from_url(url)
+        results = stream_emails(url, self.extract_jobs, lambda job: self.generate_email(job, url=url, company=company),
+                                max_pages=max_pages or self.config.stream_max_pages,
+                                max_in_flight=max_in_flight, prefetch_jobs=2 * max_in_flight,
+                                fetch=self.fetch, clean=self.clean)
+        for result in results:
+            yield {**(result["email"] or {"email": None}), "url": result["url"], "job": result["job"],
+                   "error": result["error"]}
+
+    def close(self) -> None:
+        """Stop the request batcher thread, if one was started."""
+        with self._lock:
+            if self._batcher is not None:
+                self._batcher.close()
+                self._batcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Model, batching, semantic cache and single-flight stats for this pipeline."""
+        cache = self.cache
+        return {
+            **self.policy.report(),
+            "batching": self._batcher.stats() if self._batcher else None,
+            "semantic_cache": cache.stats() if cache is not None else None,
+            "singleflight": generation_flight.stats(),
+        }
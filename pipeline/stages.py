@@ -0,0 +1,200 @@
+import os
+import uuid
+from typing import Dict, Any, List, Callable, Optional
+
+import chromadb
+import pandas as pd
+from langchain_openai import ChatOpenAI
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_community.document_loaders import WebBaseLoader
+from langchain_core.prompts import PromptTemplate
+
+from job_schema import extract_jobs_structured
+from page_filter import prefilter_page
+import streaming
+from variants import generate_variants, rank_variants
+from vectorstore import open_collection
+from embedding_service import get_embedding_service
+
+HEADERS = {'User-Agent': os.environ['USER_AGENT']}
+
+
+def initialize_llm():
+    """Initialize an LLM. Try OpenAI first; if unavailable or quota exceeded, fallback to Gemini."""
+    preferred = os.getenv("LLM_PROVIDER", "openai").lower()
+    openai_key = os.getenv('OPENAI_API_KEY')
+    google_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
+
+    def build_openai():
+        if not openai_key:
+            raise ValueError("OPENAI_API_KEY not found")
+        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        return ChatOpenAI(temperature=0.7, openai_api_key=openai_key, model_name=model)
+
+    def build_gemini():
+        if not google_key:
+            raise ValueError("GOOGLE_API_KEY/GEMINI_API_KEY not found")
+        model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        return ChatGoogleGenerativeAI(temperature=0.7, google_api_key=google_key, model=model)
+
+    # Try preferred provider first
+    builders = [build_openai, build_gemini] if preferred == "openai" else [build_gemini, build_openai]
+    last_err = None
+    for builder in builders:
+        try:
+            return builder()
+        except Exception as e:
+            print(f"LLM init failed for {builder.__name__}: {e}")
+            last_err = e
+            continue
+    raise last_err or RuntimeError("No LLM could be initialized")
+
+# ---------------------------------------------------------------- fetch / clean / extract
+
+def load_webpage(url: str) -> str:
+    """Load and extract the full text content of a webpage."""
+    try:
+        return WebBaseLoader(url, header_template=HEADERS).load().pop().page_content
+    except Exception as e:
+        print(f"Error loading webpage: {e}")
+        raise
+
+def fetch_page(url: str):
+    """Default fetch stage: download (at most STREAM_MAX_PAGE_BYTES) and parse one page."""
+    try:
+        return streaming.fetch_page(url)
+    except Exception as e:
+        print(f"Error loading webpage: {e}")
+        raise
+
+def clean_page(soup) -> Dict[str, Any]:
+    """Default clean stage: JobPosting JSON-LD, or only the job-relevant regions of the page."""
+    page = prefilter_page(soup)
+    print(f"Pre-filter ({page['source']}): {page['chars_in']} -> {page['chars_out']} chars")
+    return page
+
+def extract_job_details(page_data: str, llm) -> List[Dict[str, Any]]:
+    """Default extract stage.
+
+    Uses the provider's structured output with the typed Job schema and repairs
+    near-valid JSON locally before re-running the prompt.
+    """
+    try:
+        return extract_jobs_structured(llm, page_data)
+    except Exception as e:
+        print(f"Error extracting job details: {e}")
+        raise
+
+# ---------------------------------------------------------------- retrieve
+
+def initialize_chroma_collection(path: str, embedding_function: Optional[Any] = None) -> chromadb.Collection:
+    """Open the portfolio collection.
+
+    - Creates the collection with HNSW settings from CHROMA_HNSW_* env vars.
+    - An unreadable store is moved aside and recreated in place (see vectorstore.py).
+    """
+    try:
+        ef = embedding_function if embedding_function is not None else get_embedding_service()
+        return open_collection(path, embedding_function=ef)
+    except Exception as e:
+        print(f"Error initializing ChromaDB collection: {e}")
+        raise
+
+def populate_portfolio(collection: chromadb.Collection, df: pd.DataFrame) -> None:
+    """Populate the portfolio collection with data from DataFrame."""
+    try:
+        if not collection.count():
+            # One add call so all rows are embedded as a single batch
+            collection.add(
+                documents=df["Techstack"].tolist(),
+                metadatas=[{"links": link} for link in df["Links"]],
+                ids=[str(uuid.uuid4()) for _ in range(len(df))]
+            )
+            print("Portfolio collection populated successfully")
+    except Exception as e:
+        print(f"Error populating portfolio: {e}")
+        raise
+
+def get_relevant_links(collection: chromadb.Collection, skills: List[str], n_results: int = 2) -> List[Dict[str, Any]]:
+    """Default retrieve stage: a flat list of {"links": ...} metadata dicts for the job's skills."""
+    try:
+        if isinstance(skills, str):
+            skills = skills.split(",")
+        skills_text = ", ".join(str(s).strip() for s in skills if str(s).strip())
+        if not skills_text:
+            return []
+        results = collection.query(query_texts=[skills_text], n_results=n_results)
+        return [m for m in (results.get('metadatas') or [[]])[0] if m]
+    except Exception as e:
+        print(f"Error getting relevant links: {e}")
+        raise
+
+# ---------------------------------------------------------------- generate
+
+EMAIL_PROMPT = PromptTemplate.from_template(
+    """
+    Write a professional cold email for the following job opportunity. Be concise and direct.
+    
+    Job Details:
+    - Role: {role}
+    - Experience Required: {experience}
+    - Required Skills: {skills}
+    - Description: {description}
+    
+    Company Context:
+    You are Anu, a business development executive at AtliQ. AtliQ is an AI & Software Consulting company 
+    that helps businesses automate and optimize their processes. We have extensive experience in delivering 
+    scalable solutions that reduce costs and improve efficiency.
+    
+    Portfolio Links to Include:
+    {links}
+    
+    Instructions:
+    1. Write a brief, professional cold email
+    2. Focus on how AtliQ can help with their specific needs
+    3. Include relevant portfolio links
+    4. Keep it under 200 words
+    5. Include a clear call to action
+    
+    Email Format:
+    Subject: [Write a compelling subject]
+    
+    [Write the email body]
+    
+    Best regards,
+    Anu
+    Business Development Executive | AtliQ
+    """
+)
+
+def email_variables(job: Dict[str, Any], links: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Prompt variables for EMAIL_PROMPT."""
+    skills = job.get("skills", [])
+    return {
+        "role": job["role"],
+        "experience": job.get("experience", ""),
+        "skills": skills if isinstance(skills, str) else ", ".join(skills),
+        "description": job.get("description", ""),
+        "links": "\n".join([f"- {link['links']}" for link in links])
+    }
+
+def generate_cold_email(job: Dict[str, Any], links: List[Dict[str, Any]], llm, prompt: PromptTemplate = EMAIL_PROMPT,
+                        variables: Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]] = email_variables) -> str:
+    """Default generate stage: a cold email based on the job description and portfolio links."""
+    try:
+        email = (prompt | llm).invoke(variables(job, links))
+        return email.content
+    except Exception as e:
+        print(f"Error generating cold email: {e}")
+        raise
+
+def generate_cold_email_variants(job: Dict[str, Any], links: List[Dict[str, Any]], llm, n: int = 3,
+                                 prompt: PromptTemplate = EMAIL_PROMPT,
+                                 variables: Callable[[Dict[str, Any], List[Dict[str, Any]]], Dict[str, Any]] = email_variables) -> Dict[str, Any]:
+    """Generate n candidate emails in one round trip and rank them locally."""
+    try:
+        emails = generate_variants(prompt, variables(job, links), llm, n)
+        return rank_variants(emails, links)
+    except Exception as e:
+        print(f"Error generating cold email variants: {e}")
+        raise
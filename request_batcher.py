@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+
+from model_policy import ModelPolicy
+
+
+class _Item:
+    def __init__(self, stage: str, variables: Dict[str, Any], validate: Optional[Callable[[str], bool]]):
+        self.stage = stage
+        self.variables = variables
+        self.validate = validate
+        self.enqueued = time.perf_counter()
+        self.future: Future = Future()
+
+
+class LLMRequestBatcher:
+    """Aggregates concurrent generation requests into LangChain `batch` calls.
+
+    Requests arriving within the batching window are grouped per stage and sent as
+    one `(prompt | llm).batch(...)` with bounded concurrency, so a single worker
+    keeps its provider connections busy without exceeding rate limits. The window
+    adapts to load: it is the time the observed arrival rate needs to fill the rest
+    of the batch given what is already queued, capped by max_window_ms and by the SLO
+    headroom left after the recent batch service time. A lone request (arrivals
+    further apart than the cap) only waits min_window_ms; a full queue waits not at all.
+    """
+
+    def __init__(self, policy: ModelPolicy, prompt, slo_ms: Optional[float] = None,
+                 min_window_ms: Optional[float] = None, max_window_ms: Optional[float] = None,
+                 max_batch: Optional[int] = None, max_concurrency: Optional[int] = None):
+        self.policy = policy
+        self.prompt = prompt
+        self.slo = float(slo_ms if slo_ms is not None else os.getenv("LLM_BATCH_SLO_MS", "6000")) / 1000
+        self.min_window = float(min_window_ms if min_window_ms is not None else os.getenv("LLM_BATCH_MIN_WINDOW_MS", "2")) / 1000
+        self.max_window = float(max_window_ms if max_window_ms is not None else os.getenv("LLM_BATCH_MAX_WINDOW_MS", "20")) / 1000
+        self.max_batch = int(max_batch or os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+        self.max_concurrency = int(max_concurrency or os.getenv("LLM_BATCH_MAX_CONCURRENCY", "8"))
+        self._service_ewma: Optional[float] = None
+        self._arrival_gap_ewma: Optional[float] = None
+        self._last_arrival: Optional[float] = None
+        self._closed = False
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm-batch")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "queue_wait_total": 0.0, "max_batch_seen": 0}
+        self._collector = threading.Thread(target=self._collect, name="llm-batcher", daemon=True)
+        self._collector.start()
+
+    @property
+    def window(self) -> float:
+        """How long the collector waits for more requests after the first one of a batch."""
+        missing = self.max_batch - 1 - self._queue.qsize()
+        if missing <= 0:
+            return 0.0
+        ceiling = self.max_window
+        if self._service_ewma is not None:
+            ceiling = max(self.min_window, min(ceiling, self.slo - self._service_ewma))
+        gap = self._arrival_gap_ewma
+        if gap is None or gap >= ceiling:
+            return self.min_window
+        return min(ceiling, max(self.min_window, missing * gap))
+
+    def submit(self, stage: str, variables: Dict[str, Any], validate: Optional[Callable[[str], bool]] = None) -> str:
+        """Generate one completion for the prompt variables; blocks until its batch finishes."""
+        item = _Item(stage, variables, validate)
+        with self._lock:
+            # Checked and enqueued under the lock so nothing lands behind close()'s sentinel
+            if self._closed:
+                raise RuntimeError("LLM request batcher is closed")
+            if self._last_arrival is not None:
+                gap = item.enqueued - self._last_arrival
+                self._arrival_gap_ewma = gap if self._arrival_gap_ewma is None else 0.8 * self._arrival_gap_ewma + 0.2 * gap
+            self._last_arrival = item.enqueued
+            self._queue.put(item)
+        return item.future.result()
+
+    def _collect(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            by_stage: Dict[str, List[_Item]] = {}
+            for item in batch:
+                by_stage.setdefault(item.stage, []).append(item)
+            for stage, items in by_stage.items():
+                self._executor.submit(self._run, stage, items)
+
+    def _run(self, stage: str, items: List[_Item]) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            self._stats["requests"] += len(items)
+            self._stats["batches"] += 1
+            self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(items))
+            self._stats["queue_wait_total"] += sum(start - item.enqueued for item in items)
+
+        def call(llm, batch_items: List[_Item]) -> List[Any]:
+            outputs = (self.prompt | llm).batch(
+                [item.variables for item in batch_items],
+                config={"max_concurrency": self.max_concurrency},
+                return_exceptions=True
+            )
+            return [o if isinstance(o, Exception) else o.content for o in outputs]
+
+        try:
+            results = self.policy.run_batch(
+                stage, call, items,
+                lambda item, output: item.validate is None or item.validate(output)
+            )
+        except Exception as e:
+            results = [e] * len(items)
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._service_ewma = elapsed if self._service_ewma is None else 0.8 * self._service_ewma + 0.2 * elapsed
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                item.future.set_exception(result)
+            else:
+                item.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+            stats["avg_queue_wait_ms"] = 1000 * stats.pop("queue_wait_total") / stats["requests"] if stats["requests"] else 0.0
+            stats["window_ms"] = self.window * 1000
+            stats["service_ewma_ms"] = self._service_ewma * 1000 if self._service_ewma is not None else None
+            stats["arrival_gap_ms"] = self._arrival_gap_ewma * 1000 if self._arrival_gap_ewma is not None else None
+            stats["slo_ms"] = self.slo * 1000
+        return stats
+
+    def close(self) -> None:
+        """Stop accepting requests; queued ones are still sent, and any left over are failed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._collector.join(timeout=1)
+        self._executor.shutdown(wait=False)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and not item.future.done():
+                item.future.set_exception(RuntimeError("LLM request batcher is closed"))
+
+
+def openai_batch_complete(prompts: List[str], model: str, temperature: float = 0.7,
+                          poll_seconds: float = 30, timeout_seconds: float = 24 * 3600) -> List[Optional[str]]:
+    """Run prompts through the OpenAI Batch API (non-interactive, discounted, separate rate limits).
+
+    Returns one completion per prompt, or None for requests the batch did not complete.
+    """
+    from openai import OpenAI
+
+    client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+    lines = [
+        json.dumps({
+            "custom_id": f"req-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {"model": model, "temperature": temperature,
+                     "messages": [{"role": "user", "content": prompt}]},
+        })
+        for i, prompt in enumerate(prompts)
+    ]
+    batch_file = client.files.create(file=("emails.jsonl", "\n".join(lines).encode("utf-8")), purpose="batch")
+    batch = client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions",
+                                  completion_window="24h")
+    deadline = time.time() + timeout_seconds
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        if time.time() > deadline:
+            client.batches.cancel(batch.id)
+            break
+        time.sleep(poll_seconds)
+        batch = client.batches.retrieve(batch.id)
+
+    results: List[Optional[str]] = [None] * len(prompts)
+    if not batch.output_file_id:
+        print(f"OpenAI batch {batch.id} finished with status {batch.status} and no output")
+        return results
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        index = int(row["custom_id"].split("-", 1)[1])
+        body = (row.get("response") or {}).get("body") or {}
+        choices = body.get("choices") or []
+        if choices:
+            results[index] = choices[0]["message"]["content"]
+    return results
@@ -0,0 +1,143 @@
+import os
+import time
+import uuid
+import threading
+from typing import Dict, Any, List, Optional
+
+import chromadb
+from chromadb.config import Settings
+
+
+def job_to_text(job: Dict[str, Any]) -> str:
+    """Flatten a job dict into the text that gets embedded for cache lookups."""
+    skills = job.get("skills", [])
+    if isinstance(skills, (list, tuple)):
+        skills = ", ".join(str(s).strip() for s in skills)
+    parts = [
+        f"Role: {job.get('role', '')}",
+        f"Experience: {job.get('experience', '')}",
+        f"Skills: {skills}",
+        f"Description: {job.get('description', '')}",
+    ]
+    return "\n".join(" ".join(str(p).split()) for p in parts)
+
+
+def links_key(links: List[Dict[str, Any]]) -> str:
+    """Order-independent signature of the retrieved portfolio links."""
+    return "|".join(sorted(str(link.get("links", "")) for link in links))
+
+
+class SemanticEmailCache:
+    """Near-duplicate cache for generated emails, keyed by job-description embeddings.
+
+    A lookup is a hit when the closest cached job has cosine similarity >= threshold,
+    was generated with exactly the same portfolio links and prompt (prompt_key), and is
+    younger than ttl_seconds.
+    """
+
+    def __init__(self, path: Optional[str] = None, threshold: Optional[float] = None,
+                 ttl_seconds: Optional[float] = None, collection_name: str = "email_cache",
+                 embedding_function: Optional[Any] = None):
+        self.path = path or os.getenv("SEMANTIC_CACHE_PATH", "./semantic_cache")
+        self.threshold = float(threshold if threshold is not None else os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+        self.ttl_seconds = float(ttl_seconds if ttl_seconds is not None else os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600)))
+        client = chromadb.PersistentClient(path=self.path, settings=Settings(anonymized_telemetry=False, allow_reset=True))
+        ef = {"embedding_function": embedding_function} if embedding_function is not None else {}
+        self.collection = client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"},
+            **ef
+        )
+        self._lock = threading.Lock()
+        self._stats = {"lookups": 0, "hits": 0, "misses": 0, "stale": 0, "adapted": 0, "stores": 0}
+        self._hit_similarity_total = 0.0
+        self._hit_age_total = 0.0
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def lookup(self, job: Dict[str, Any], links: List[Dict[str, Any]], prompt: str = "") -> Optional[Dict[str, Any]]:
+        """Return a cached (possibly adapted) email for a near-duplicate job, or None."""
+        self._count("lookups")
+        try:
+            if not self.collection.count():
+                self._count("misses")
+                return None
+            results = self.collection.query(
+                query_texts=[job_to_text(job)],
+                n_results=1,
+                where={"$and": [{"links_key": links_key(links)}, {"prompt": prompt}]}
+            )
+        except Exception as e:
+            print(f"Semantic cache lookup failed: {e}")
+            self._count("misses")
+            return None
+
+        ids = results.get("ids", [[]])[0]
+        if not ids:
+            self._count("misses")
+            return None
+        similarity = 1.0 - float(results["distances"][0][0])
+        meta = results["metadatas"][0][0]
+        if similarity < self.threshold:
+            self._count("misses")
+            return None
+
+        age = time.time() - float(meta.get("created_at", 0))
+        if age > self.ttl_seconds:
+            self._count("stale")
+            self._count("misses")
+            try:
+                self.collection.delete(ids=[ids[0]])
+            except Exception as e:
+                print(f"Semantic cache eviction failed: {e}")
+            return None
+
+        email, adapted = self._adapt(meta.get("email", ""), meta.get("role", ""), job.get("role", ""))
+        with self._lock:
+            self._stats["hits"] += 1
+            self._stats["adapted"] += int(adapted)
+            self._hit_similarity_total += similarity
+            self._hit_age_total += age
+        return {"email": email, "similarity": similarity, "age_seconds": age, "adapted": adapted}
+
+    @staticmethod
+    def _adapt(email: str, cached_role: str, role: str):
+        """Swap the cached role title for the new one when the postings differ only in wording."""
+        cached_role, role = cached_role.strip(), str(role).strip()
+        if not cached_role or not role or cached_role == role or cached_role not in email:
+            return email, False
+        return email.replace(cached_role, role), True
+
+    def store(self, job: Dict[str, Any], links: List[Dict[str, Any]], email: str, prompt: str = "") -> None:
+        """Record a freshly generated email for future near-duplicate lookups."""
+        try:
+            self.collection.add(
+                documents=[job_to_text(job)],
+                metadatas=[{
+                    "links_key": links_key(links),
+                    "prompt": prompt,
+                    "role": str(job.get("role", "")),
+                    "email": email,
+                    "created_at": time.time(),
+                }],
+                ids=[str(uuid.uuid4())]
+            )
+            self._count("stores")
+        except Exception as e:
+            print(f"Semantic cache store failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate and staleness metrics since this cache instance was created."""
+        with self._lock:
+            stats = dict(self._stats)
+            hits = stats["hits"]
+            stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+            stats["stale_rate"] = stats["stale"] / stats["lookups"] if stats["lookups"] else 0.0
+            stats["avg_hit_similarity"] = self._hit_similarity_total / hits if hits else None
+            stats["avg_hit_age_seconds"] = self._hit_age_total / hits if hits else None
+        stats["entries"] = self.collection.count()
+        stats["threshold"] = self.threshold
+        stats["ttl_seconds"] = self.ttl_seconds
+        return stats
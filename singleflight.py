@@ -0,0 +1,94 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Any, Callable, Tuple
+
+
+def prompt_key(prompt: Any) -> str:
+    """Short fingerprint of a prompt template, so emails written from different prompts never share keys."""
+    template = getattr(prompt, "template", prompt)
+    return hashlib.sha256(str(template).encode("utf-8")).hexdigest()[:16]
+
+
+def job_key(job: Dict[str, Any], scope: str = "") -> str:
+    """Stable key for a job payload: case/whitespace-insensitive, skill order ignored.
+
+    scope (e.g. a prompt_key) separates otherwise identical jobs.
+    """
+    skills = job.get("skills", [])
+    if isinstance(skills, str):
+        skills = skills.split(",")
+    normalized = {
+        "role": " ".join(str(job.get("role", "")).lower().split()),
+        "experience": " ".join(str(job.get("experience", "")).lower().split()),
+        "skills": sorted({" ".join(str(s).lower().split()) for s in skills if str(s).strip()}),
+        "description": " ".join(str(job.get("description", "")).lower().split()),
+    }
+    if scope:
+        normalized["scope"] = scope
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight block and receive the same result (or exception). Nothing is
+    cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {"executions": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key. Returns (result, shared) where shared is True for followers."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
+
+
+# Process-wide group shared by the Flask and Streamlit entry points.
+generation_flight = SingleFlight()
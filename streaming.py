@@ -0,0 +1,179 @@
+import os
+import re
+import queue
+import threading
+from collections import deque
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Iterable, Iterator, Optional, Tuple
+
+import requests
+from bs4 import BeautifulSoup
+
+from page_filter import prefilter_page
+from singleflight import job_key
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+MAX_PAGE_BYTES = int(os.getenv("STREAM_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+NEXT_TEXT = re.compile(r"^\s*(next|next page|more jobs|load more|›|»|>)\s*$", re.I)
+
+_DONE = object()
+
+
+def fetch_page(url: str, session: Optional[requests.Session] = None, max_bytes: int = MAX_PAGE_BYTES) -> BeautifulSoup:
+    """Stream one page, reading at most max_bytes, and parse it.
+
+    The Content-Type charset is used when the server sends one; otherwise the raw bytes
+    go to BeautifulSoup, which detects the encoding from <meta charset> or the content
+    (requests would otherwise assume ISO-8859-1 for text/html).
+    """
+    with (session or requests).get(url, headers={'User-Agent': USER_AGENT}, stream=True, timeout=30) as res:
+        res.raise_for_status()
+        chunks, size = [], 0
+        for chunk in res.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_bytes:
+                print(f"Truncating {url} at {max_bytes} bytes")
+                break
+        body = b"".join(chunks)
+        declared = "charset" in res.headers.get("Content-Type", "").lower()
+    if declared and res.encoding:
+        return BeautifulSoup(body.decode(res.encoding, errors="replace"), "html.parser")
+    return BeautifulSoup(body, "html.parser")
+
+
+def next_page_url(soup: BeautifulSoup, current_url: str) -> Optional[str]:
+    """Find the pagination link: rel=next first, then 'Next'-style anchors."""
+    tag = soup.find(["link", "a"], rel="next")
+    if tag is None:
+        for a in soup.find_all("a", href=True):
+            label = a.get("aria-label") or a.get_text(" ", strip=True)
+            if NEXT_TEXT.match(label or "") or (a.get("aria-label") or "").lower().startswith("next"):
+                tag = a
+                break
+    href = tag.get("href") if tag is not None else None
+    return urljoin(current_url, href) if href and not href.startswith(("#", "javascript:")) else None
+
+
+def crawl_pages(start_url: str, max_pages: int = 50,
+                fetch: Optional[Callable[[str], Any]] = None) -> Iterator[Tuple[str, Any]]:
+    """Lazily follow a paginated listing, yielding one fetched page at a time.
+
+    fetch(url) defaults to fetch_page; pagination links are only followed when it
+    returns parsed HTML (BeautifulSoup).
+    """
+    session = requests.Session()
+    fetch = fetch or (lambda page_url: fetch_page(page_url, session))
+    visited = set()
+    url = start_url
+    while url and url not in visited and len(visited) < max_pages:
+        visited.add(url)
+        try:
+            page = fetch(url)
+        except Exception as e:
+            print(f"Error loading {url}: {e}")
+            return
+        # Find the next link before the page is cleaned; cleaning strips navigation
+        following = next_page_url(page, url) if isinstance(page, BeautifulSoup) else None
+        yield url, page
+        url = following
+
+
+def iter_jobs(start_url: str, extract_fn: Callable[[str], List[Dict[str, Any]]], max_pages: int = 50,
+              fetch: Optional[Callable[[str], Any]] = None,
+              clean: Optional[Callable[[Any], Dict[str, Any]]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Yield (page_url, job) as each listing page is extracted; repeated postings are skipped.
+
+    clean(page) -> {"jobs", "text"} defaults to prefilter_page.
+    """
+    clean = clean or prefilter_page
+    seen = set()
+    for url, raw in crawl_pages(start_url, max_pages, fetch):
+        try:
+            page = clean(raw)
+            del raw
+            jobs = page["jobs"] or (extract_fn(page["text"]) if page["text"] else [])
+        except Exception as e:
+            print(f"Error extracting jobs from {url}: {e}")
+            continue
+        for job in jobs:
+            key = job_key(job)
+            if key in seen:
+                continue
+            seen.add(key)
+            yield url, job
+
+
+def prefetch(iterable: Iterable[Any], maxsize: int) -> Iterator[Any]:
+    """Run an iterator in a background thread, buffering at most maxsize items ahead of the consumer."""
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(entry) -> bool:
+        # Block while the buffer is full, but give up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(("item", item)):
+                    return
+            put(("done", _DONE))
+        except Exception as e:
+            put(("error", e))
+
+    thread = threading.Thread(target=produce, name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = buffer.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+
+
+def map_bounded(fn: Callable[[Any], Any], iterable: Iterable[Any], max_in_flight: int) -> Iterator[Any]:
+    """Ordered concurrent map that never has more than max_in_flight calls (or results) outstanding."""
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        window: deque = deque()
+        for item in iterable:
+            window.append(pool.submit(fn, item))
+            if len(window) >= max_in_flight:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def stream_emails(start_url: str, extract_fn: Callable[[str], List[Dict[str, Any]]],
+                  email_fn: Callable[[Dict[str, Any]], Any], max_pages: int = 50,
+                  max_in_flight: int = 4, prefetch_jobs: int = 8,
+                  fetch: Optional[Callable[[str], Any]] = None,
+                  clean: Optional[Callable[[Any], Dict[str, Any]]] = None) -> Iterator[Dict[str, Any]]:
+    """Crawl -> extract -> retrieve/generate as a pipeline with bounded buffers.
+
+    Pages are fetched and extracted in a background thread at most prefetch_jobs jobs
+    ahead of generation, and at most max_in_flight emails are generated concurrently,
+    so memory stays flat however many listing pages the site has. Yields dicts with
+    url, job and email (or error) in crawl order. fetch/clean replace the default
+    fetch_page/prefilter_page stages.
+    """
+    def generate(item: Tuple[str, Dict[str, Any]]) -> Dict[str, Any]:
+        url, job = item
+        try:
+            return {"url": url, "job": job, "email": email_fn(job), "error": None}
+        except Exception as e:
+            return {"url": url, "job": job, "email": None, "error": str(e)}
+
+    jobs = prefetch(iter_jobs(start_url, extract_fn, max_pages, fetch, clean), prefetch_jobs)
+    yield from map_bounded(generate, jobs, max_in_flight)
@@ -0,0 +1,49 @@
+import re
+from typing import Dict, Any, List, Optional
+
+from langchain_openai import ChatOpenAI
+
+from model_policy import EMAIL_WORD_LIMIT
+
+MAX_VARIANTS = 5
+
+
+def score_email(email: str, links: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Local, model-free quality checks for one candidate email."""
+    words = len(email.split())
+    urls = [link.get("links") for link in links or [] if link.get("links")]
+    included = sum(1 for url in urls if url in email)
+    has_subject = bool(re.search(r"^\s*subject\s*:", email, re.I | re.M))
+    within_limit = 0 < words <= EMAIL_WORD_LIMIT
+
+    score = 0.0
+    score += 3.0 if within_limit else -min(3.0, (words - EMAIL_WORD_LIMIT) / 50)
+    score += 2.0 * (included / len(urls) if urls else 1.0)
+    score += 2.0 if has_subject else 0.0
+    # Among otherwise-equal variants prefer the tighter one
+    score -= words / (EMAIL_WORD_LIMIT * 10)
+    return {"score": round(score, 4), "words": words, "links_included": included,
+            "has_subject": has_subject, "within_limit": within_limit}
+
+
+def rank_variants(emails: List[str], links: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Rank candidate emails; returns the best plus the alternates in descending score order."""
+    scored = [{"email": email, **score_email(email, links)} for email in emails if email and email.strip()]
+    if not scored:
+        raise ValueError("No usable email variants were generated")
+    scored.sort(key=lambda v: -v["score"])
+    return {"email": scored[0]["email"], "best": scored[0], "alternates": scored[1:]}
+
+
+def generate_variants(prompt, variables: Dict[str, Any], llm, n: int) -> List[str]:
+    """Produce n completions for one prompt.
+
+    OpenAI returns all n choices from a single request; other providers are
+    fanned out concurrently with Runnable.batch.
+    """
+    n = max(1, min(int(n), MAX_VARIANTS))
+    prompt_value = prompt.invoke(variables)
+    if isinstance(llm, ChatOpenAI):
+        result = llm.generate([prompt_value.to_messages()], n=n)
+        return [gen.text for gen in result.generations[0]]
+    return [msg.content for msg in llm.batch([prompt_value] * n)]
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Chroma vector store maintenance.
+
+HNSW parameters are fixed when a collection is created, so tuning them means
+rebuilding the collection. This module provides the shared collection opener
+used by the apps plus a CLI to rebuild, migrate/compact and benchmark stores:
+
+    python vectorstore.py rebuild --path vectorstore --m 32 --ef-construction 200 --ef-search 50
+    python vectorstore.py migrate --source vectorstore_fresh --path vectorstore --remove-source
+    python vectorstore.py bench --path vectorstore --sweep-ef 10,50,100 --k 2
+"""
+
+import os
+import time
+import json
+import shutil
+import sqlite3
+import argparse
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import pandas as pd
+import chromadb
+from chromadb.config import Settings
+from chromadb.api.client import SharedSystemClient
+from chromadb.utils import embedding_functions
+
+COLLECTION_NAME = "portfolio"
+BATCH_SIZE = 256
+
+
+def hnsw_metadata(space: Optional[str] = None, m: Optional[int] = None, ef_construction: Optional[int] = None,
+                  ef_search: Optional[int] = None) -> Dict[str, Any]:
+    """Chroma collection metadata for the given HNSW settings (unset values keep existing/default ones)."""
+    metadata = {}
+    if space:
+        metadata["hnsw:space"] = space
+    if m:
+        metadata["hnsw:M"] = int(m)
+    if ef_construction:
+        metadata["hnsw:construction_ef"] = int(ef_construction)
+    if ef_search:
+        metadata["hnsw:search_ef"] = int(ef_search)
+    return metadata
+
+
+def hnsw_metadata_from_env() -> Dict[str, Any]:
+    """HNSW settings from CHROMA_HNSW_SPACE / _M / _EF_CONSTRUCTION / _EF_SEARCH."""
+    return hnsw_metadata(
+        space=os.getenv("CHROMA_HNSW_SPACE", "l2"),
+        m=os.getenv("CHROMA_HNSW_M"),
+        ef_construction=os.getenv("CHROMA_HNSW_EF_CONSTRUCTION"),
+        ef_search=os.getenv("CHROMA_HNSW_EF_SEARCH"),
+    )
+
+
+def _client(path: str) -> chromadb.ClientAPI:
+    return chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False, allow_reset=True))
+
+
+def open_collection(path: str, name: str = COLLECTION_NAME, metadata: Optional[Dict[str, Any]] = None,
+                    embedding_function: Optional[Any] = None) -> chromadb.Collection:
+    """Open a collection, creating it with the configured HNSW settings if it does not exist.
+
+    embedding_function defaults to Chroma's local ONNX embedder; pass the shared
+    EmbeddingService to run embedding in worker processes instead.
+
+    If the store cannot be read (e.g. written by an incompatible Chroma version) it is moved
+    aside to <path>.bak-<timestamp> and a clean store is created in place, rather than
+    forking to a separate <path>_fresh directory. Run `python vectorstore.py migrate` to
+    bring data from old stores back in.
+    """
+    metadata = metadata or hnsw_metadata_from_env()
+    ef = {"embedding_function": embedding_function} if embedding_function is not None else {}
+    try:
+        client = _client(path)
+    except Exception as inner:
+        return _recreate(path, name, metadata, ef, inner)
+    try:
+        collection = client.get_collection(name=name, **ef)
+    except ValueError:
+        # Missing collection only; other errors (bad metadata, embedding function clash)
+        # propagate without touching the store
+        collection = client.create_collection(name=name, metadata=metadata, **ef)
+    except sqlite3.DatabaseError as inner:
+        return _recreate(path, name, metadata, ef, inner)
+    try:
+        _ = collection.count()
+    except Exception as inner:
+        return _recreate(path, name, metadata, ef, inner)
+    return collection
+
+
+def _recreate(path: str, name: str, metadata: Dict[str, Any], ef: Dict[str, Any], error: Exception) -> chromadb.Collection:
+    backup = f"{path}.bak-{int(time.time())}"
+    print(f"Chroma store at {path} is unreadable ({error}); moving it to {backup} and starting a clean store.")
+    if os.path.exists(path):
+        shutil.move(path, backup)
+    # Chroma caches one system per path; without clearing it the new client would still
+    # point at the moved store and create_collection would hit its existing collection
+    SharedSystemClient.clear_system_cache()
+    client = _client(path)
+    return client.create_collection(name=name, metadata=metadata, **ef)
+
+
+def _read_all(collection: chromadb.Collection) -> Dict[str, List[Any]]:
+    data = {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
+    total = collection.count()
+    for offset in range(0, total, BATCH_SIZE):
+        batch = collection.get(limit=BATCH_SIZE, offset=offset, include=["documents", "metadatas", "embeddings"])
+        for key in data:
+            data[key].extend(batch[key] or [])
+    return data
+
+
+def _dedupe(data: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """Drop rows repeating an earlier (document, metadata) pair, e.g. from repeated populate runs."""
+    seen = set()
+    out = {key: [] for key in data}
+    for i in range(len(data["ids"])):
+        key = (data["documents"][i], json.dumps(data["metadatas"][i], sort_keys=True))
+        if key in seen:
+            continue
+        seen.add(key)
+        for field in data:
+            out[field].append(data[field][i])
+    return out
+
+
+def _write_all(collection: chromadb.Collection, data: Dict[str, List[Any]]) -> None:
+    for start in range(0, len(data["ids"]), BATCH_SIZE):
+        end = start + BATCH_SIZE
+        collection.add(
+            ids=data["ids"][start:end],
+            documents=data["documents"][start:end],
+            metadatas=data["metadatas"][start:end],
+            embeddings=[list(map(float, e)) for e in data["embeddings"][start:end]],
+        )
+
+
+def rebuild(path: str, name: str = COLLECTION_NAME, metadata: Optional[Dict[str, Any]] = None,
+            dedupe: bool = True) -> Dict[str, Any]:
+    """Rebuild a collection with new HNSW settings, reusing stored embeddings and compacting the index.
+
+    Settings not given in metadata are carried over from the existing collection.
+    """
+    client = _client(path)
+    source = client.get_collection(name=name)
+    metadata = {**(source.metadata or {}), **(metadata or {})}
+    data = _read_all(source)
+    before = len(data["ids"])
+    if dedupe:
+        data = _dedupe(data)
+
+    tmp_name = f"{name}__rebuild"
+    try:
+        client.delete_collection(tmp_name)
+    except Exception:
+        pass
+    target = client.create_collection(name=tmp_name, metadata=metadata or None)
+    _write_all(target, data)
+    client.delete_collection(name)
+    target.modify(name=name)
+    return {"collection": name, "rows_before": before, "rows_after": len(data["ids"]), "metadata": metadata}
+
+
+def migrate(source_path: str, path: str, name: str = COLLECTION_NAME, metadata: Optional[Dict[str, Any]] = None,
+            remove_source: bool = False) -> Dict[str, Any]:
+    """Merge a stale store (e.g. vectorstore_fresh) into the primary store, then rebuild it compacted."""
+    source = _client(source_path).get_collection(name=name)
+    data = _read_all(source)
+    target = open_collection(path, name, metadata)
+    existing = set(target.get(include=[])["ids"])
+    keep = [i for i, id_ in enumerate(data["ids"]) if id_ not in existing]
+    _write_all(target, {key: [values[i] for i in keep] for key, values in data.items()})
+    result = rebuild(path, name, metadata)
+    result["migrated_rows"] = len(keep)
+    if remove_source:
+        shutil.rmtree(source_path)
+        result["removed_source"] = source_path
+    return result
+
+
+def _exact_neighbors(matrix: np.ndarray, queries: np.ndarray, k: int, space: str) -> List[List[int]]:
+    if space == "cosine":
+        matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+        dist = -queries @ matrix.T
+    elif space == "ip":
+        dist = -queries @ matrix.T
+    else:
+        dist = ((queries[:, None, :] - matrix[None, :, :]) ** 2).sum(-1)
+    return np.argsort(dist, axis=1)[:, :k].tolist()
+
+
+def bench(path: str, name: str = COLLECTION_NAME, queries: Optional[List[str]] = None, k: int = 2,
+          sweep_ef: Optional[List[int]] = None, m: Optional[int] = None,
+          ef_construction: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recall@k (vs. exact search) and query latency for HNSW settings on a sample query set.
+
+    The stored embeddings are loaded into throwaway in-memory collections, one per
+    ef_search value, so the persistent store is never modified.
+    """
+    collection = _client(path).get_collection(name=name)
+    data = _dedupe(_read_all(collection))
+    if not data["ids"]:
+        raise ValueError(f"Collection {name} at {path} is empty")
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    queries = queries or data["documents"]
+    embed = embedding_functions.DefaultEmbeddingFunction()
+    query_vectors = np.array(embed(queries), dtype=np.float32)
+    matrix = np.array(data["embeddings"], dtype=np.float32)
+    k = min(k, len(data["ids"]))
+    truth = _exact_neighbors(matrix, query_vectors, k, space)
+
+    results = []
+    for ef in sweep_ef or [(collection.metadata or {}).get("hnsw:search_ef", 10)]:
+        metadata = hnsw_metadata(space, m or (collection.metadata or {}).get("hnsw:M"),
+                                 ef_construction or (collection.metadata or {}).get("hnsw:construction_ef"), ef)
+        client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False, allow_reset=True))
+        trial = client.create_collection(name=f"bench_{ef}", metadata=metadata)
+        _write_all(trial, data)
+        latencies, hits = [], 0
+        for qi, vector in enumerate(query_vectors):
+            start = time.perf_counter()
+            res = trial.query(query_embeddings=[vector.tolist()], n_results=k, include=[])
+            latencies.append((time.perf_counter() - start) * 1000)
+            expected = {data["ids"][i] for i in truth[qi]}
+            hits += len(expected & set(res["ids"][0]))
+        client.delete_collection(trial.name)
+        results.append({
+            "ef_search": ef,
+            "recall_at_k": hits / (k * len(query_vectors)),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "queries": len(query_vectors),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chroma vector store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def tuning(p):
+        p.add_argument("--path", default="./vectorstore")
+        p.add_argument("--name", default=COLLECTION_NAME)
+        p.add_argument("--space", default=os.getenv("CHROMA_HNSW_SPACE"), choices=["l2", "cosine", "ip"])
+        p.add_argument("--m", type=int, default=os.getenv("CHROMA_HNSW_M"))
+        p.add_argument("--ef-construction", type=int, default=os.getenv("CHROMA_HNSW_EF_CONSTRUCTION"))
+        p.add_argument("--ef-search", type=int, default=os.getenv("CHROMA_HNSW_EF_SEARCH"))
+
+    p_rebuild = sub.add_parser("rebuild", help="Rebuild a collection with new HNSW settings (also compacts it)")
+    tuning(p_rebuild)
+    p_rebuild.add_argument("--keep-duplicates", action="store_true")
+
+    p_migrate = sub.add_parser("migrate", help="Merge an old/forked store into the primary store")
+    tuning(p_migrate)
+    p_migrate.add_argument("--source", required=True)
+    p_migrate.add_argument("--remove-source", action="store_true")
+
+    p_bench = sub.add_parser("bench", help="Report recall vs. latency on a sample query set")
+    tuning(p_bench)
+    p_bench.add_argument("--k", type=int, default=2)
+    p_bench.add_argument("--sweep-ef", default=None, help="Comma-separated ef_search values, e.g. 10,50,100")
+    p_bench.add_argument("--queries", default=None, help="CSV with a Techstack column, or a text file with one query per line")
+
+    args = parser.parse_args()
+    metadata = hnsw_metadata(args.space, args.m, args.ef_construction, args.ef_search)
+
+    if args.command == "rebuild":
+        print(json.dumps(rebuild(args.path, args.name, metadata, dedupe=not args.keep_duplicates), indent=2))
+    elif args.command == "migrate":
+        print(json.dumps(migrate(args.source, args.path, args.name, metadata, args.remove_source), indent=2))
+    else:
+        queries = None
+        if args.queries:
+            if args.queries.endswith(".csv"):
+                queries = pd.read_csv(args.queries)["Techstack"].tolist()
+            else:
+                with open(args.queries) as f:
+                    queries = [line.strip() for line in f if line.strip()]
+        sweep = [int(v) for v in args.sweep_ef.split(",")] if args.sweep_ef else None
+        for row in bench(args.path, args.name, queries, args.k, sweep, args.m, args.ef_construction):
+            print(f"ef_search={row['ef_search']:<5} recall@{args.k}={row['recall_at_k']:.3f} "
+                  f"p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms ({row['queries']} queries)")
+
+
+if __name__ == "__main__":
+    main()
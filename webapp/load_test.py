@@ -0,0 +1,446 @@
+"""
+Load generator for the Flask service.
+
+Replays recorded or synthetic job traces (same payload format as submit_payload.py)
+against the app, either in-process with stub LLM/embedding backends or against a
+running server, and reports throughput, latency percentiles, error rates and the
+per-stage breakdown returned by /generate-email.
+
+    python webapp/load_test.py --stub --mode closed --concurrency 1,2,4,8,16 --requests 200
+    python webapp/load_test.py --stub --mode open --rate 5,10,20,40 --duration 30
+    python webapp/load_test.py --target http://localhost:5000 --trace traces.jsonl --mode open
+    python webapp/load_test.py --from-ledger ledger.db --write-trace traces.jsonl
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from webapp.submit_payload import payload as BASE_PAYLOAD
+
+ROLES = ["Data Scientist", "Machine Learning Engineer", "Backend Engineer", "Full Stack Developer",
+         "Data Engineer", "DevOps Engineer", "Frontend Engineer", "Senior Software Engineer"]
+SKILLS = ["Python", "Machine Learning", "NLP", "Data Analysis", "React", "Node.js", "MongoDB", "Django",
+          "MySQL", "AWS", "Docker", "Kubernetes", "Java", "Spring", "PostgreSQL", "Angular", ".NET", "Go"]
+
+
+# ---------------------------------------------------------------- traces
+
+def synthetic_trace(n: int, duplicate_ratio: float = 0.1, seed: int = 7) -> List[Dict[str, Any]]:
+    """n payloads shaped like submit_payload.payload; duplicate_ratio of them repeat earlier ones."""
+    rng = random.Random(seed)
+    trace = []
+    for i in range(n):
+        if trace and rng.random() < duplicate_ratio:
+            trace.append({"payload": dict(rng.choice(trace)["payload"])})
+            continue
+        skills = rng.sample(SKILLS, rng.randint(3, 6))
+        trace.append({"payload": {
+            **BASE_PAYLOAD,
+            "role": rng.choice(ROLES),
+            "experience": f"{rng.randint(1, 8)}+ years",
+            "skills": ", ".join(skills),
+            "description": f"{BASE_PAYLOAD['description']} Stack: {', '.join(skills)}. Req #{i}.",
+        }})
+    return trace
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """JSONL, one {"t": seconds_offset?, "payload": {...}} (or a bare payload) per line."""
+    trace = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                trace.append(row if "payload" in row else {"payload": row})
+    return trace
+
+
+def trace_from_ledger(path: str, limit: int = 1000) -> List[Dict[str, Any]]:
+    """Recorded traffic: past generations from the ledger, with their original relative timing."""
+    conn = sqlite3.connect(path)
+    rows = conn.execute(
+        "SELECT created_at, job_json, url, company FROM generations ORDER BY created_at LIMIT ?", (limit,)
+    ).fetchall()
+    conn.close()
+    if not rows:
+        return []
+    t0 = rows[0][0]
+    trace = []
+    for created_at, job_json, url, company in rows:
+        job = json.loads(job_json)
+        payload = {
+            "role": job.get("role", ""),
+            "experience": job.get("experience", ""),
+            "skills": ", ".join(s.strip() for s in job.get("skills", [])),
+            "description": job.get("description", ""),
+        }
+        if url:
+            payload["url"] = url
+        if company:
+            payload["company"] = company
+        trace.append({"t": created_at - t0, "payload": payload})
+    return trace
+
+
+# ---------------------------------------------------------------- stub backends
+
+def install_stubs(llm_latency_ms: float, embed_latency_ms: float, cache: bool = False) -> None:
+    """Point the in-process app at fake LLM/embedding backends and fresh throwaway stores.
+
+    Called once per load level so no level is served from an earlier level's ledger or
+    semantic cache. The semantic cache is off unless cache is set.
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from chromadb.api.types import Documents, Embeddings, EmbeddingFunction
+    from model_policy import ModelPolicy
+    from semantic_cache import SemanticEmailCache
+    from ledger import GenerationLedger
+    from pipeline import EmailPipeline, PipelineConfig
+    import webapp.app as app_module
+
+    class StubChatModel(BaseChatModel):
+        latency_ms: float = 800.0
+
+        @property
+        def _llm_type(self) -> str:
+            return "stub"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            prompt = "\n".join(str(m.content) for m in messages)
+            role = next((line.split(":", 1)[1].strip() for line in prompt.splitlines()
+                         if line.strip().startswith("- Role:")), "the role")
+            links = [line.strip()[2:] for line in prompt.splitlines() if line.strip().startswith("- http")]
+            generations = []
+            for _ in range(int(kwargs.get("n", 1))):
+                time.sleep(random.expovariate(1000.0 / self.latency_ms))
+                text = (f"Subject: AtliQ for your {role} opening\n\nHi,\n\nAtliQ can help with your {role} needs.\n"
+                        + "\n".join(links) + "\n\nBest regards,\nAnu")
+                generations.append(ChatGeneration(message=AIMessage(content=text)))
+            return ChatResult(generations=generations)
+
+    class StubModelPolicy(ModelPolicy):
+        def llm_for(self, stage: str, model: str):
+            with self._lock:
+                return self._llms.setdefault((stage, model), StubChatModel(latency_ms=llm_latency_ms))
+
+    class StubEmbeddingFunction(EmbeddingFunction):
+        """Hashed bag-of-words vectors with a fixed CPU-ish cost per text."""
+
+        def __call__(self, input: Documents) -> Embeddings:
+            vectors = []
+            for text in input:
+                time.sleep(embed_latency_ms / 1000)
+                vec = [0.0] * 384
+                for word in text.lower().split():
+                    vec[int(hashlib.md5(word.encode()).hexdigest(), 16) % 384] += 1.0
+                norm = sum(v * v for v in vec) ** 0.5 or 1.0
+                vectors.append([v / norm for v in vec])
+            return vectors
+
+    workdir = tempfile.mkdtemp(prefix="coldmail-load-")
+    embedder = StubEmbeddingFunction()
+    if app_module._pipeline is not None:
+        app_module._pipeline.close()
+    app_module._pipeline = EmailPipeline(
+        PipelineConfig(vectorstore_path=os.path.join(workdir, "vectorstore"), semantic_cache=cache),
+        policy=StubModelPolicy(provider="openai"),
+        ledger=GenerationLedger(path=os.path.join(workdir, "ledger.db")),
+        cache=SemanticEmailCache(path=os.path.join(workdir, "semantic_cache"), embedding_function=embedder),
+        embedding_function=embedder
+    )
+    print(f"Stub backends installed (LLM ~{llm_latency_ms:.0f}ms, embed {embed_latency_ms:.1f}ms/text, "
+          f"semantic cache {'on' if cache else 'off'}), stores in {workdir}")
+
+
+# ---------------------------------------------------------------- clients
+
+class InProcessClient:
+    """Dispatches through app.test_request_context, like smoke_test.py; the pinned
+    Flask 2.0 test_client() is incompatible with the pinned Werkzeug 2.2."""
+
+    def __init__(self):
+        from webapp.app import app
+        self.app = app
+
+    def post(self, payload: Dict[str, Any]):
+        with self.app.test_request_context("/generate-email", method="POST", json=payload):
+            res = self.app.full_dispatch_request()
+        return res.status_code, res.get_json(silent=True) or {}
+
+
+class HttpClient:
+    def __init__(self, base_url: str, timeout: float = 120):
+        self.url = base_url.rstrip("/") + "/generate-email"
+        self.timeout = timeout
+
+    def post(self, payload: Dict[str, Any]):
+        req = urllib.request.Request(self.url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as res:
+                return res.status, json.loads(res.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"{}")
+
+
+# ---------------------------------------------------------------- runners
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, scheduled: float, started: float, finished: float, status: int, body: Dict[str, Any]):
+        source = ("ledger" if body.get("ledger") else "coalesced" if body.get("coalesced")
+                  else "semantic_cache" if body.get("cached") else "generated")
+        ok = status == 200 and "error" not in body
+        with self.lock:
+            self.samples.append({
+                # Latency is measured from the scheduled send time so queueing behind a
+                # saturated worker is counted (no coordinated omission in open-loop runs).
+                "latency": finished - scheduled,
+                "service": finished - started,
+                "ok": ok,
+                "status": status,
+                "error": None if ok else body.get("error") or body,
+                "source": source,
+                "timings": body.get("timings") or {},
+                "finished": finished,
+            })
+
+
+def _send(client, payload: Dict[str, Any], recorder: Recorder, scheduled: float, force: bool):
+    started = time.perf_counter()
+    try:
+        status, body = client.post({**payload, "force": True} if force else payload)
+    except Exception as e:
+        status, body = 599, {"error": str(e)}
+    recorder.add(scheduled, started, time.perf_counter(), status, body)
+
+
+def run_closed(client, trace: List[Dict[str, Any]], concurrency: int, requests: int,
+               think_ms: float = 0, force: bool = True, offset: int = 0) -> Recorder:
+    """Closed loop: `concurrency` users, each sending its next request when the previous returns.
+
+    Payloads are taken from the trace starting at index offset.
+    """
+    recorder = Recorder()
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def user():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            _send(client, trace[(offset + i) % len(trace)]["payload"], recorder, time.perf_counter(), force)
+            if think_ms:
+                time.sleep(random.expovariate(1000.0 / think_ms))
+
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder
+
+
+def run_open(client, trace: List[Dict[str, Any]], rate: Optional[float], duration: float,
+             max_workers: int = 256, force: bool = True, offset: int = 0) -> Recorder:
+    """Open loop: arrivals independent of completions; Poisson at `rate`/s, or the trace's own `t` offsets."""
+    recorder = Recorder()
+    first = offset
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    start = time.perf_counter()
+    if rate:
+        offsets, t = [], 0.0
+        while t < duration:
+            t += random.expovariate(rate)
+            offsets.append(t)
+    else:
+        offsets = [row.get("t", 0.0) for row in trace if row.get("t", 0.0) <= duration]
+    for i, offset in enumerate(offsets):
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        pool.submit(_send, client, trace[(first + i) % len(trace)]["payload"], recorder, start + offset, force)
+    pool.shutdown(wait=True)
+    return recorder
+
+
+# ---------------------------------------------------------------- report
+
+def _pct(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarize(recorder: Recorder, label: str, wall: float) -> Dict[str, Any]:
+    samples = recorder.samples
+    ok = [s for s in samples if s["ok"]]
+    latencies = [s["latency"] * 1000 for s in ok]
+    # Ledger/cache hits and coalesced followers never reach generation; capacity is judged on the rest
+    generated = [s["latency"] * 1000 for s in ok if s["source"] == "generated"]
+    stages: Dict[str, List[float]] = {}
+    for s in ok:
+        for stage, value in s["timings"].items():
+            stages.setdefault(stage, []).append(value * 1000)
+    errors = [s for s in samples if not s["ok"]]
+    sources: Dict[str, int] = {}
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        sources[s["source"]] = sources.get(s["source"], 0) + 1
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    return {
+        "label": label,
+        "requests": len(samples),
+        "throughput_rps": len(ok) / wall if wall else 0.0,
+        "generated_rps": len(generated) / wall if wall else 0.0,
+        "hit_rate": 1 - len(generated) / len(ok) if ok else 0.0,
+        "error_rate": 1 - len(ok) / len(samples) if samples else 0.0,
+        "latency_ms": {**{p: _pct(latencies, float(p[1:])) for p in ("p50", "p90", "p95", "p99")},
+                       "max": max(latencies, default=None)},
+        "generated_latency_ms": {p: _pct(generated, float(p[1:])) for p in ("p50", "p95", "p99")},
+        "stages_ms": {stage: {"p50": _pct(v, 50), "p95": _pct(v, 95)} for stage, v in stages.items()},
+        "sources": sources,
+        "statuses": statuses,
+        "first_error": {"status": errors[0]["status"], "error": errors[0]["error"]} if errors else None,
+    }
+
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:8.0f}" if value is not None else f"{'-':>8}"
+
+
+def print_report(rows: List[Dict[str, Any]], slo_ms: float) -> None:
+    print(f"\n{'load':>10} {'reqs':>6} {'rps':>8} {'gen rps':>8} {'hit%':>6} {'err%':>6} {'p50':>8} {'p95':>8} {'p99':>8}"
+          f" {'gen p95':>8}  stages (p50 ms)")
+    best = None
+    for row in rows:
+        lat = row["latency_ms"]
+        gen = row["generated_latency_ms"]
+        stages = " ".join(f"{k}={v['p50']:.0f}" for k, v in row["stages_ms"].items() if v["p50"] is not None)
+        print(f"{row['label']:>10} {row['requests']:>6} {row['throughput_rps']:>8.2f} {row['generated_rps']:>8.2f}"
+              f" {100 * row['hit_rate']:>6.1f} {100 * row['error_rate']:>6.1f}"
+              f"{_ms(lat['p50'])}{_ms(lat['p95'])}{_ms(lat['p99'])}{_ms(gen['p95'])}  {stages}")
+        # Saturation is judged on requests that actually generated; hits would inflate it
+        within = gen["p95"] is not None and gen["p95"] <= slo_ms and row["error_rate"] < 0.01
+        if within and (best is None or row["generated_rps"] > best["generated_rps"]):
+            best = row
+    if best:
+        print(f"\nSaturation point (generated p95 <= {slo_ms:.0f}ms, <1% errors): {best['label']} at "
+              f"{best['generated_rps']:.2f} generated req/s")
+    else:
+        print(f"\nNo load level met generated p95 <= {slo_ms:.0f}ms with <1% errors")
+    for row in rows:
+        if row["first_error"]:
+            print(f"{row['label']}: first error (status {row['first_error']['status']}): {row['first_error']['error']}")
+    hits = [row for row in rows if row["hit_rate"] > 0.5]
+    if hits:
+        print("Mostly served by ledger/cache/coalescing (not a capacity measurement): "
+              + ", ".join(f"{row['label']} ({100 * row['hit_rate']:.0f}%)" for row in hits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay job traces against the cold email service")
+    parser.add_argument("--target", default="inproc", help="'inproc' (in-process Flask dispatch) or a base URL")
+    parser.add_argument("--stub", action="store_true", help="Use stub LLM/embedding backends (inproc only)")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--embed-latency-ms", type=float, default=2)
+    parser.add_argument("--trace", help="JSONL trace file")
+    parser.add_argument("--from-ledger", help="Build the trace from a generation ledger (recorded traffic)")
+    parser.add_argument("--write-trace", help="Write the trace to this JSONL file and exit")
+    parser.add_argument("--synthetic", type=int, default=None,
+                        help="Synthetic trace size when no trace is given (default: enough for every level)")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Closed loop: comma-separated user counts")
+    parser.add_argument("--requests", type=int, default=100, help="Closed loop: requests per level")
+    parser.add_argument("--think-ms", type=float, default=0)
+    parser.add_argument("--rate", default=None, help="Open loop: comma-separated req/s; omit to replay trace timing")
+    parser.add_argument("--duration", type=float, default=30, help="Open loop: seconds per level")
+    parser.add_argument("--no-force", action="store_true", help="Allow ledger reuse instead of forcing generation")
+    parser.add_argument("--cache", action="store_true", help="Keep the semantic cache on with --stub (off by default)")
+    parser.add_argument("--slo-ms", type=float, default=float(os.getenv("LLM_BATCH_SLO_MS", "6000")))
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    elif args.from_ledger:
+        trace = trace_from_ledger(args.from_ledger)
+    else:
+        size = args.synthetic
+        if size is None and args.mode == "closed":
+            size = args.requests * len(args.concurrency.split(","))
+        elif size is None and args.rate:
+            size = int(sum(1.5 * float(r) * args.duration for r in args.rate.split(",")) + 1)
+        trace = synthetic_trace(size or 200, args.duplicate_ratio)
+    if not trace:
+        parser.error("Trace is empty")
+    if args.write_trace:
+        with open(args.write_trace, "w") as f:
+            for row in trace:
+                f.write(json.dumps(row) + "\n")
+        print(f"Wrote {len(trace)} trace rows to {args.write_trace}")
+        return
+
+    stub = args.target == "inproc" and args.stub
+    client = InProcessClient() if args.target == "inproc" else HttpClient(args.target)
+
+    rows = []
+    force = not args.no_force
+    # Each level continues where the previous one stopped in the trace, so a level is not
+    # answered from responses cached while replaying the same payloads at an earlier level
+    offset = 0
+    if args.mode == "closed":
+        for level in [int(v) for v in args.concurrency.split(",")]:
+            if stub:
+                install_stubs(args.llm_latency_ms, args.embed_latency_ms, args.cache)
+            start = time.perf_counter()
+            recorder = run_closed(client, trace, level, args.requests, args.think_ms, force, offset)
+            rows.append(summarize(recorder, f"c={level}", time.perf_counter() - start))
+            offset += len(recorder.samples)
+    else:
+        rates = [float(v) for v in args.rate.split(",")] if args.rate else [None]
+        for rate in rates:
+            if stub:
+                install_stubs(args.llm_latency_ms, args.embed_latency_ms, args.cache)
+            start = time.perf_counter()
+            recorder = run_open(client, trace, rate, args.duration, force=force, offset=offset if rate else 0)
+            rows.append(summarize(recorder, f"{rate:g}/s" if rate else "trace", time.perf_counter() - start))
+            offset += len(recorder.samples)
+
+    if offset > len(trace):
+        print(f"Warning: replayed {offset} requests from a {len(trace)}-row trace; later levels repeat payloads")
+    print_report(rows, args.slo_ms)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"mode": args.mode, "target": args.target, "stub": args.stub, "levels": rows}, f, indent=2)
+        print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()